@@ -0,0 +1,23 @@
+from settings import *
+
+class AnimationClock:
+    """ One clock for every animation in the editor
+    - The tiles don't keep their own frame index. Every animation uses the same frame index, frame_table[frame_index % len(frame_table)]
+    - The frame index only changes ANIMATION_SPEED times a second, so the animated tiles only need to be drawn again when it does
+    """
+    def __init__(self, speed = ANIMATION_SPEED):
+        self.speed = speed # Frames per second
+        self.time = 0 # Seconds since the clock started
+        self.frame_index = 0
+
+    def update(self, dt):
+        # Returns True if the animations have moved on to the next frame
+        self.time += dt
+        frame_index = int(self.time * self.speed)
+        changed = frame_index != self.frame_index
+        self.frame_index = frame_index
+        return changed
+
+    def get_time_to_next_frame(self):
+        # In seconds
+        return (self.frame_index + 1) / self.speed - self.time
@@ -0,0 +1,49 @@
+import pygame
+from os.path import splitext
+from settings import *
+from support import import_folder, get_image_names
+
+class AssetManager:
+    """ Loads the graphics of the editor data when they are first used, instead of loading everything at start-up
+    - Every path is only loaded once, and the same surface is shared by everything that uses it
+    - Images that have been packed into an atlas (see atlas.py) are subsurfaces of the atlas pages, so they are never loaded from their own files
+    - Animation sets (the "graphics" folders) are kept once they are loaded. The tile sets keep the frames of every animation they draw (see zoom.py), so removing a set here wouldn't free any memory, and the next tile set would load it again as a second copy
+    """
+    def __init__(self, atlases = ()):
+        self.packed = {} # Image path without the extension: subsurface of an atlas page
+        for atlas in atlases:
+            self.packed.update(atlas.get_surfaces())
+
+        self.images = {} # Path: surface (menu and preview images)
+        self.animations = {} # Folder path: list of frames (The frames of the sets that are in an atlas share the pixels of the atlas pages)
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Loading
+    def get_image(self, path):
+        if path not in self.images and splitext(path)[0] in self.packed:
+            self.images[path] = self.packed[splitext(path)[0]]
+        if path not in self.images:
+            image_surface = pygame.image.load(path)
+            # Convert the surface to the pixel format of the display (This can only be done once the display has been created)
+            self.images[path] = image_surface.convert_alpha() if pygame.display.get_surface() else image_surface
+        return self.images[path]
+
+    def get_animation(self, folder):
+        if folder not in self.animations:
+            names = [folder + "/" + splitext(image_name)[0] for image_name in get_image_names(folder)]
+            if names and all(name in self.packed for name in names):
+                # The frames are in the same order as import_folder would give them
+                self.animations[folder] = [self.packed[name] for name in names]
+            else:
+                self.animations[folder] = import_folder(folder)
+        return self.animations[folder]
+
+    # Editor data
+    def get_menu_surf(self, tile_id):
+        return self.get_image(EDITOR_DATA[tile_id]["menu_surf"])
+
+    def get_preview(self, tile_id):
+        return self.get_image(EDITOR_DATA[tile_id]["preview"])
+
+    def get_frames(self, tile_id):
+        return self.get_animation(EDITOR_DATA[tile_id]["graphics"])
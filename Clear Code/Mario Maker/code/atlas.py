@@ -0,0 +1,144 @@
+import pygame, json
+from os import makedirs, stat
+from os.path import join, exists
+from settings import *
+from support import get_image_names, import_images
+
+""" Texture atlases:
+- Lots of small images are packed into a few large surfaces (pages), with an index of where each image is (name: page, rect)
+- Drawing an image is then a blit of an area of a shared page, rather than a blit of its own surface
+- The pages are saved as raw RGBA pixels rather than PNGs, so loading them doesn't need any decoding
+- The atlases are built by running this file (python code/atlas.py from the Mario Maker folder). If an atlas is missing or any of its images have changed, load_atlas builds it again
+- The land tiles, the animations that the tile sets load at start-up (water, coins and enemies, see zoom.py) and the menu and preview images are packed. The AssetManager gives out subsurfaces of the pages for them (see assets.py)
+- The palms and the player aren't drawn by the editor yet, so their graphics are still loaded from their own files if they are ever used
+"""
+
+ANIMATED_STYLES = ("water", "coin", "enemy") # The styles whose animations are drawn on the canvas
+
+def get_animation_folders():
+    # The animation folders of the editor data that are drawn on the canvas
+    return sorted({value["graphics"] for value in EDITOR_DATA.values() if value["style"] in ANIMATED_STYLES})
+
+def get_menu_images():
+    # The menu and preview images of the editor data
+    return sorted({value[key] for value in EDITOR_DATA.values() for key in ("menu_surf", "preview") if value[key]})
+
+# The folders and single images that go into each atlas
+ATLAS_SOURCES = {
+    "land": {"folders": ["graphics/terrain/land"], "images": []},
+    "animations": {"folders": get_animation_folders(), "images": ["graphics/terrain/water/water_bottom.png"]},
+    "menu": {"folders": [], "images": get_menu_images()},
+}
+
+class Atlas:
+    def __init__(self, pages, rects):
+        self.pages = pages # List of surfaces
+        self.rects = rects # Image name: (page index, rect)
+
+    def get_surfaces(self):
+        # The same image name: surface dictionary that import_folder_dict gives (Subsurfaces share their pixels with the page, so no pixels are copied)
+        return {name: self.pages[page_index].subsurface(rect) for name, (page_index, rect) in self.rects.items()}
+
+# ------------------------------------------------------------------------------------------------------------------------
+# Packing
+def pack_surfaces(surfaces, page_size = ATLAS_PAGE_SIZE):
+    """ Pack the surfaces into pages using shelves:
+    - The images are sorted from tallest to shortest, then placed from left to right along a shelf
+    - When a shelf is full, a new shelf is started below it. When a page is full, a new page is started
+    """
+    rects = {}
+    page_count = 0
+    x = y = shelf_height = 0
+    for name, surface in sorted(surfaces.items(), key = lambda item: (-item[1].get_height(), item[0])):
+        width, height = surface.get_size()
+        # Start a new shelf
+        if x + width > page_size:
+            x, y = 0, y + shelf_height
+            shelf_height = 0
+        # Start a new page
+        if y + height > page_size or page_count == 0:
+            page_count += 1
+            x = y = shelf_height = 0
+
+        rects[name] = (page_count - 1, pygame.Rect(x, y, width, height))
+        x += width
+        shelf_height = max(shelf_height, height)
+
+    # Only make each page as large as it needs to be
+    pages = []
+    for page_index in range(page_count):
+        page_rects = [rect for index, rect in rects.values() if index == page_index]
+        page_width = max(rect.right for rect in page_rects)
+        page_height = max(rect.bottom for rect in page_rects)
+        pages.append(pygame.Surface((page_width, page_height), pygame.SRCALPHA))
+
+    for name, (page_index, rect) in rects.items():
+        pages[page_index].blit(surfaces[name], rect)
+
+    return Atlas(pages, rects)
+
+# ------------------------------------------------------------------------------------------------------------------------
+# Building and loading
+def get_source_stats(name):
+    # The modification time and size of every image in the atlas (used to check if the atlas needs to be built again)
+    sources = ATLAS_SOURCES[name]
+    paths = [folder + "/" + image_name for folder in sources["folders"] for image_name in get_image_names(folder)] + sources["images"]
+    return {path: [stat(path).st_mtime_ns, stat(path).st_size] for path in paths}
+
+def load_sources(name):
+    # Land tiles are named by their file name (e.g. "ABC") so that they match import_folder_dict, everything else is named by its path without the extension
+    sources = ATLAS_SOURCES[name]
+    surfaces = {}
+    for folder in sources["folders"]:
+        for image_name, image_surface in import_images(folder):
+            key = image_name.split(".")[0] if name == "land" else folder + "/" + image_name.split(".")[0]
+            surfaces[key] = image_surface
+    for path in sources["images"]:
+        surfaces[path.split(".")[0]] = pygame.image.load(path)
+    return surfaces
+
+def build_atlas(name):
+    atlas = pack_surfaces(load_sources(name))
+
+    # Save the pages and the index
+    makedirs(ATLAS_PATH, exist_ok = True)
+    for page_index, page in enumerate(atlas.pages):
+        with open(join(ATLAS_PATH, f"{name}_{page_index}.rgba"), "wb") as page_file:
+            page_file.write(pygame.image.tostring(page, "RGBA"))
+    index = {
+        "pages": [page.get_size() for page in atlas.pages],
+        "rects": {image_name: [page_index, list(rect)] for image_name, (page_index, rect) in atlas.rects.items()},
+        "sources": get_source_stats(name),
+    }
+    with open(join(ATLAS_PATH, f"{name}.json"), "w") as index_file:
+        json.dump(index, index_file)
+
+    return atlas
+
+def load_atlas(name):
+    index_path = join(ATLAS_PATH, f"{name}.json")
+    index = None
+    if exists(index_path):
+        with open(index_path) as index_file:
+            index = json.load(index_file)
+
+    # Build the atlas if it hasn't been built yet, or if any of its images have changed
+    if index is None or index["sources"] != get_source_stats(name):
+        atlas = build_atlas(name)
+    else:
+        pages = []
+        for page_index, page_size in enumerate(index["pages"]):
+            with open(join(ATLAS_PATH, f"{name}_{page_index}.rgba"), "rb") as page_file:
+                pages.append(pygame.image.frombuffer(page_file.read(), page_size, "RGBA"))
+        rects = {image_name: (page_index, pygame.Rect(rect)) for image_name, (page_index, rect) in index["rects"].items()}
+        atlas = Atlas(pages, rects)
+
+    # Convert the pages to the pixel format of the display (This can only be done once the display has been created)
+    atlas.pages = [page.convert_alpha() if pygame.display.get_surface() else page.copy() for page in atlas.pages]
+    return atlas
+
+# Build step
+if __name__ == "__main__":
+    for atlas_name in ATLAS_SOURCES:
+        atlas = build_atlas(atlas_name)
+        print(f"{atlas_name}: {len(atlas.rects)} images packed into {len(atlas.pages)} page(s)")
@@ -0,0 +1,169 @@
+import os, sys, time, queue, shutil, struct, threading, subprocess
+from settings import *
+from level_file import LevelFile, CELL_RECORD, HAS_TERRAIN, HAS_WATER, WATER_ON_TOP, ERASED, write_level
+
+""" Autosave
+- The canvas records which cells have changed (canvas_data.changed_cells). Every AUTOSAVE_INTERVAL seconds, the values of those cells are copied into a batch of records
+- Copying is spread over as many frames as it needs, spending at most AUTOSAVE_FRAME_BUDGET seconds in each frame. A cell that changes again while it is being copied is copied again in the next batch
+- A worker thread adds each batch to the end of the journal file (so writing to the disk never happens inside of a frame)
+- Once the journal is larger than AUTOSAVE_JOURNAL_LIMIT, the worker combines the last snapshot and the journal into a new snapshot (a level file, see level_file.py) and empties the journal
+- Closing the editor normally removes the snapshot and the journal. After a crash: python code/autosave.py recovered.mml (from the Mario Maker folder), then open it with python code/main.py --level recovered.mml
+"""
+JOURNAL_BATCH = struct.Struct("<I") # The number of records in the batch
+JOURNAL_RECORD = struct.Struct("<iiBBBB") # Column, row, flags, terrain mask, coin id, enemy id
+
+def read_autosave(path):
+    # The cells of the snapshot with every complete batch of the journal applied, as cell pos: (flags, terrain mask, coin id, enemy id)
+    cells = {}
+    if os.path.exists(path):
+        snapshot = LevelFile(path)
+        for chunk_pos in snapshot.index:
+            first_column, first_row = chunk_pos[0] * snapshot.chunk_size, chunk_pos[1] * snapshot.chunk_size
+            for column, row, flags, terrain_mask, coin, enemy in CELL_RECORD.iter_unpack(snapshot.read_records(chunk_pos)):
+                cells[(first_column + column, first_row + row)] = (flags, terrain_mask, coin, enemy)
+        snapshot.close()
+
+    if os.path.exists(path + ".journal"):
+        with open(path + ".journal", "rb") as journal_file:
+            journal = journal_file.read()
+        offset = 0
+        while offset + JOURNAL_BATCH.size <= len(journal):
+            record_count = JOURNAL_BATCH.unpack_from(journal, offset)[0]
+            batch_end = offset + JOURNAL_BATCH.size + record_count * JOURNAL_RECORD.size
+            # The last batch is left out if the editor crashed while it was being written
+            if batch_end > len(journal):
+                break
+            for column, row, flags, terrain_mask, coin, enemy in JOURNAL_RECORD.iter_unpack(journal[offset + JOURNAL_BATCH.size:batch_end]):
+                if flags & ERASED:
+                    cells.pop((column, row), None)
+                else:
+                    cells[(column, row)] = (flags, terrain_mask, coin, enemy)
+            offset = batch_end
+    return cells
+
+def write_autosave(path, out_path):
+    # Combine the snapshot and the journal into a level file
+    records = {}
+    for (column, row), record in read_autosave(path).items():
+        chunk_records = records.setdefault((column // CHUNK_SIZE, row // CHUNK_SIZE), bytearray())
+        chunk_records += CELL_RECORD.pack(column % CHUNK_SIZE, row % CHUNK_SIZE, *record)
+    write_level(out_path, CHUNK_SIZE, records).close()
+
+class Autosave:
+    def __init__(self, canvas_data, path = AUTOSAVE_PATH, level_path = None, interval = AUTOSAVE_INTERVAL, journal_limit = AUTOSAVE_JOURNAL_LIMIT):
+        self.canvas_data = canvas_data
+        self.interval = interval # Seconds between autosaves
+        self.journal_limit = journal_limit # In bytes
+        self.canvas_data.changed_cells = set() # Start recording which cells change
+        self.path = path
+        self.journal_path = path + ".journal"
+
+        # Keep the autosave of the last session (if the editor crashed), instead of writing over it
+        if os.path.exists(self.path) or os.path.exists(self.journal_path):
+            write_autosave(self.path, self.path + ".recovered")
+            print(f"The autosave of the last session was saved to {self.path}.recovered")
+
+        # The snapshot starts as a copy of the level that was opened (if there is one)
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok = True)
+        self.reset(level_path)
+
+        # Batch that is being copied
+        self.last_autosave = time.perf_counter()
+        self.pending_cells = set() # Cells that still need to be copied into the batch
+        self.records = bytearray()
+        self.record_count = 0
+
+        # Worker thread
+        self.batches = queue.Queue()
+        self.worker = threading.Thread(target = self.write_batches, daemon = True)
+        self.worker.start()
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # SUPPORT
+    def reset(self, level_path = None):
+        # Start again from a level file (e.g. after it has been saved), as everything before it no longer needs to be recovered
+        for path in (self.path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+        if level_path and os.path.exists(level_path):
+            shutil.copyfile(level_path, self.path)
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Main thread
+    def level_saved(self, level_path):
+        # The worker starts again from the saved level once it has written the batches before it
+        self.batches.put(("reset", level_path))
+
+    def update(self):
+        # Called once per frame
+        start = time.perf_counter()
+        if not self.pending_cells:
+            if start - self.last_autosave < self.interval or not self.canvas_data.changed_cells:
+                return
+            # Take the cells that have changed since the last autosave (the canvas starts recording again from here)
+            self.pending_cells = self.canvas_data.changed_cells
+            self.canvas_data.changed_cells = set()
+
+        # Copy the values of the cells into the batch until the time for this frame has been used up (the time is checked every 32 cells)
+        get_tile = self.canvas_data.get
+        pending_cells = self.pending_cells
+        while pending_cells and time.perf_counter() - start < AUTOSAVE_FRAME_BUDGET:
+            for cell_index in range(min(32, len(pending_cells))):
+                cell_pos = pending_cells.pop()
+                tile = get_tile(cell_pos)
+                if tile:
+                    flags = (HAS_TERRAIN if tile.has_terrain else 0) | (HAS_WATER if tile.has_water else 0) | (WATER_ON_TOP if tile.water_on_top else 0)
+                    self.records += JOURNAL_RECORD.pack(cell_pos[0], cell_pos[1], flags, tile.terrain_mask, tile.coin or 0, tile.enemy or 0)
+                else:
+                    self.records += JOURNAL_RECORD.pack(cell_pos[0], cell_pos[1], ERASED, 0, 0, 0)
+                self.record_count += 1
+
+        # The batch is complete, so hand it to the worker
+        if not self.pending_cells:
+            self.batches.put(("batch", JOURNAL_BATCH.pack(self.record_count) + self.records))
+            self.records = bytearray()
+            self.record_count = 0
+            self.last_autosave = time.perf_counter()
+
+    def stop(self):
+        # Wait for the worker to write the batches that have been handed to it
+        self.batches.put(("stop", None))
+        self.worker.join()
+
+        # The editor was closed normally, so there is nothing to recover (otherwise the next session would treat this one as a crash)
+        for path in (self.path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Worker thread
+    def write_batches(self):
+        while True:
+            message, value = self.batches.get()
+            if message == "stop":
+                return
+            if message == "reset":
+                self.reset(value)
+                continue
+
+            with open(self.journal_path, "ab") as journal_file:
+                journal_file.write(value)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+            # Combine the journal into a new snapshot once it has grown too large
+            # This is done by another process, as Python only runs one thread at a time (so a long job in this thread would slow down the frames)
+            if os.path.getsize(self.journal_path) > self.journal_limit:
+                subprocess.run([sys.executable, os.path.abspath(__file__), self.path, "--autosave", self.path], check = True)
+                os.remove(self.journal_path)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description = "Recover the autosave of the last session as a level file")
+    parser.add_argument("level", help = "The level file to create")
+    parser.add_argument("--autosave", default = AUTOSAVE_PATH, help = "The autosave to recover")
+    args = parser.parse_args()
+
+    write_autosave(args.autosave, args.level)
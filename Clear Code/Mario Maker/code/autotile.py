@@ -0,0 +1,49 @@
+from settings import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None # Without numpy, the bulk re-tiling in the editor falls back to checking one cell at a time
+
+""" Autotiling with bitmasks:
+- Each of the 8 neighbour directions gets its own bit, in the same order as NEIGHBOR_DIRECTIONS (A = 1, B = 2, C = 4 ... H = 128)
+- A cell stores one number (0 - 255) with the bits of the neighbours that have terrain switched on
+- The number can then be used as an index into a table of 256 land tile graphics, instead of building a string like "ABCDE" every frame
+"""
+NEIGHBOUR_BITS = {name: 1 << index for index, name in enumerate(NEIGHBOR_DIRECTIONS)}
+
+# (bit, side, opposite bit) for each neighbour direction. The opposite bit is the bit that the neighbour uses for this cell e.g. for "A" (above), it is "E" (below)
+NEIGHBOUR_OFFSETS = [
+    (NEIGHBOUR_BITS[name], side, NEIGHBOUR_BITS[opposite_name])
+    for name, side in NEIGHBOR_DIRECTIONS.items()
+    for opposite_name, opposite_side in NEIGHBOR_DIRECTIONS.items()
+    if opposite_side == (-side[0], -side[1])
+]
+
+def get_terrain_string(mask):
+    # Convert a mask back into the name of the graphic e.g. 0b00011111 ---> "ABCDE"
+    return "".join(name for name, bit in NEIGHBOUR_BITS.items() if mask & bit)
+
+def create_terrain_table(land_tiles):
+    # Find the land tile for every possible mask once, so that drawing a tile is just terrain_table[mask]
+    terrain_table = []
+    for mask in range(256):
+        # If the terrain string does not exist in the imported graphics, use the generic tile "X"
+        terrain_table.append(land_tiles.get(get_terrain_string(mask), land_tiles["X"]))
+    return terrain_table
+
+def create_masks(occupancy):
+    """ Find the mask of every cell in a region at once (Used when re-tiling a large area e.g. after loading a level)
+    - occupancy is a 2D numpy array of booleans (rows, columns), True where a cell has terrain. It must have a border of 1 cell around the region, so that the cells at the edges can see their neighbours
+    - For each direction, the whole array is shifted by the side and the bit of that direction is switched on wherever the shifted cell has terrain
+    """
+    rows = occupancy.shape[0] - 2
+    columns = occupancy.shape[1] - 2
+    masks = numpy.zeros((rows, columns), dtype = numpy.uint8)
+
+    for bit, side, opposite_bit in NEIGHBOUR_OFFSETS:
+        # The neighbour of every cell in this direction (row = y, column = x)
+        neighbours = occupancy[1 + side[1]: 1 + side[1] + rows, 1 + side[0]: 1 + side[0] + columns]
+        masks |= neighbours.astype(numpy.uint8) * numpy.uint8(bit)
+
+    return masks
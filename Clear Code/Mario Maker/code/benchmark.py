@@ -0,0 +1,295 @@
+from headless import ScriptedInput # Needs to be imported first, as it sets up the dummy video driver
+import pygame, json, time, tracemalloc, argparse, os, tempfile
+try:
+    import resource
+except ImportError:
+    resource = None # Only available on Unix, the max rss is left out without it
+from settings import *
+from main import Main
+from editor import CanvasTile
+from autosave import Autosave
+
+""" Headless editor benchmarks
+- Each scenario runs the editor with a scripted stream of input (one step of the script per frame) and records how long each frame takes
+- The time spent inside of draw_level, draw_tile_lines, check_neighbours and Menu.display is recorded as well, so that a slower result can be tracked down
+- The surfaces created while drawing the level are counted (pygame.Surface and pygame.transform), so that a surface being created on every frame shows up straight away
+- The peak Python memory is measured by running each scenario a second time with tracemalloc on (tracemalloc slows down every allocation, so it is kept out of the timed run)
+- Run from the Mario Maker folder: python code/benchmark.py [--scale 2] [--autosave] [--json results.json]
+"""
+
+# The methods that are timed separately (object name, method name)
+PHASES = [("editor", "draw_level"), ("editor", "draw_tile_lines"), ("editor", "check_neighbours"), ("editor", "update_neighbours"), ("menu", "display")]
+
+# The functions that create a new surface, counted while the level is being drawn (Surface.copy and Surface.convert can't be replaced, as they belong to a built-in type)
+ALLOCATING_FUNCTIONS = [(pygame.transform, "scale"), (pygame.transform, "smoothscale"), (pygame.transform, "rotate"), (pygame.transform, "flip"), (pygame.image, "load")]
+
+# ------------------------------------------------------------------------------------------------------------------------
+# SUPPORT
+def fill_level(editor, columns, rows, tile_id = 2):
+    # Create a block of tiles directly in the canvas, then calculate all of the terrain masks at once
+    for column in range(columns):
+        for row in range(rows):
+            editor.canvas_data[(column, row)] = CanvasTile(tile_id)
+    editor.retile_region((0, 0), (columns - 1, rows - 1))
+
+def get_cell_centre(editor, cell_pos):
+    # The position on the screen of the centre of a cell
+    return (int(editor.origin.x + cell_pos[0] * editor.tile_size + editor.tile_size / 2), int(editor.origin.y + cell_pos[1] * editor.tile_size + editor.tile_size / 2))
+
+def get_percentile(sorted_values, percentile):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percentile / 100))
+    return sorted_values[index]
+
+def time_phases(main, phase_times):
+    # Replace each method with a version that adds up how long it takes
+    objects = {"editor": main.editor, "menu": main.editor.menu}
+    for object_name, method_name in PHASES:
+        method = getattr(objects[object_name], method_name)
+        def timed_method(*args, method = method, phase = f"{object_name}.{method_name}", **kwargs):
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            phase_times[phase] = phase_times.get(phase, 0) + time.perf_counter() - start
+            return result
+        setattr(objects[object_name], method_name, timed_method)
+
+def count_allocations(main, allocations):
+    """ Count the surfaces created inside of draw_level on each frame
+    - pygame.Surface is replaced with a subclass that counts each new surface, and each allocating function with a version that counts its calls
+    - Only the surfaces created while draw_level is running are counted (e.g. not the surfaces created when the menu is drawn)
+    """
+    drawing = [False]
+    def count():
+        if drawing[0]:
+            allocations[-1] += 1
+
+    class CountedSurface(pygame.Surface):
+        def __init__(self, *args, **kwargs):
+            count()
+            super().__init__(*args, **kwargs)
+    pygame.Surface = CountedSurface
+
+    for module, function_name in ALLOCATING_FUNCTIONS:
+        function = getattr(module, function_name)
+        def counted_function(*args, function = function, **kwargs):
+            count()
+            return function(*args, **kwargs)
+        setattr(module, function_name, counted_function)
+
+    draw_level = main.editor.draw_level
+    def counted_draw_level():
+        drawing[0] = True
+        try:
+            draw_level()
+        finally:
+            drawing[0] = False
+    main.editor.draw_level = counted_draw_level
+
+def restore_allocations(originals):
+    # Put back the functions that count_allocations replaced
+    pygame.Surface = originals["Surface"]
+    for (module, function_name), function in zip(ALLOCATING_FUNCTIONS, originals["functions"]):
+        setattr(module, function_name, function)
+
+# ------------------------------------------------------------------------------------------------------------------------
+# Scenarios (each step of the generator is one frame)
+def paint_cells(main, script, scale):
+    # Paint cells one at a time across the screen, holding the left mouse button
+    editor = main.editor
+    script.move(get_cell_centre(editor, (0, 0)))
+    script.press(1)
+    cell_count = 0
+    while cell_count < 500 * scale:
+        for row in range(8):
+            for column in range(16):
+                script.move(get_cell_centre(editor, (column, row)))
+                cell_count += 1
+                yield
+        # Switch between the tile types so the same cells keep changing
+        editor.selection_index = 2 if editor.selection_index != 2 else 4
+    script.release(1)
+    yield
+
+def drag_strokes(main, script, scale):
+    # Drag strokes of coins and water across a large block of existing terrain
+    editor = main.editor
+    fill_level(editor, 40, 12)
+    for stroke in range(10 * scale):
+        editor.selection_index = (3, 4, 5, 6)[stroke % 4]
+        row = stroke % 10
+        script.move(get_cell_centre(editor, (0, row)))
+        script.press(1)
+        for x in range(0, WINDOW_WIDTH - 200, 8):
+            script.move((x, get_cell_centre(editor, (0, row))[1]))
+            yield
+        script.release(1)
+        yield
+
+def pan_level(main, script, scale):
+    # Pan around a large level with the mouse wheel, then with the middle mouse button
+    editor = main.editor
+    fill_level(editor, 400, 40)
+    for step in range(100 * scale):
+        script.wheel(-1 if (step // 50) % 2 == 0 else 1)
+        yield
+
+    script.move((WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2))
+    script.press(2)
+    for step in range(100 * scale):
+        direction = -1 if (step // 50) % 2 == 0 else 1
+        script.move((script.pos[0] + direction * 13, script.pos[1] + direction * 3))
+        yield
+    script.release(2)
+    yield
+
+def zoom_out(main, script, scale):
+    # Zoom out one level at a time on a level that is 1000 columns wide, then pan around at the most zoomed out level
+    editor = main.editor
+    fill_level(editor, 1000, 100)
+    for step in range(len(ZOOM_TILE_SIZES)):
+        script.key(pygame.K_MINUS)
+        yield
+    for step in range(100 * scale):
+        script.wheel(-1 if (step // 25) % 2 == 0 else 1)
+        yield
+
+def cycle_menu(main, script, scale):
+    # Click on the menu buttons with the left, middle and right mouse buttons, and use the arrow keys
+    menu = main.editor.menu
+    buttons = [menu.tile_button_rect, menu.coin_button_rect, menu.enemy_button_rect, menu.palm_button_rect]
+    for step in range(100 * scale):
+        script.move(buttons[step % 4].center)
+        button = (1, 3, 2)[step % 3]
+        script.press(button)
+        yield
+        script.release(button)
+        script.key(pygame.K_RIGHT if step % 2 == 0 else pygame.K_LEFT)
+        yield
+
+def animate_level(main, script, scale):
+    # Leave a screen full of water, coins and enemies animating, without any input (the chunks are rendered before the first measured frame)
+    editor = main.editor
+    fill_level(editor, 20, 6)
+    for column in range(20):
+        for row in range(6, 11):
+            editor.canvas_data[(column, row)] = CanvasTile((3, 4, 5, 6, 7, 8, 9, 10)[(column + row) % 8])
+        editor.canvas_data[(column, 11)] = CanvasTile(3)
+    editor.run(1 / 60)
+    for step in range(200 * scale):
+        yield
+
+def save_level(main, script, scale):
+    # Paint a cell then save (CTRL + S) on every frame, on a large level that has already been saved once
+    editor = main.editor
+    fill_level(editor, 1000, 100)
+    editor.level_path = os.path.join(tempfile.mkdtemp(), "benchmark.mml")
+    editor.save_level()
+    script.hold_key(pygame.K_LCTRL)
+    for step in range(50 * scale):
+        editor.selection_index = (4, 5, 6)[step % 3]
+        script.move(get_cell_centre(editor, (step % 16, step % 8)))
+        script.press(1)
+        script.key(pygame.K_s)
+        yield
+        script.release(1)
+        yield
+    script.hold_key(pygame.K_LCTRL, False)
+    editor.level_file.close()
+    os.remove(editor.level_path)
+
+SCENARIOS = {
+    "paint_cells": paint_cells,
+    "drag_strokes": drag_strokes,
+    "pan_level": pan_level,
+    "zoom_out": zoom_out,
+    "cycle_menu": cycle_menu,
+    "animate_level": animate_level,
+    "save_level": save_level,
+}
+
+# ------------------------------------------------------------------------------------------------------------------------
+# Running
+def create_main(autosave):
+    main = Main()
+    pygame.event.clear() # Remove any events left over from the last scenario
+    if autosave:
+        # Autosave much more often than normal, so that the cost of autosave shows up in a short scenario
+        main.editor.autosave = Autosave(main.editor.canvas_data, os.path.join(tempfile.mkdtemp(), "autosave.mml"), interval = 0.1, journal_limit = 256 * 1024)
+    return main
+
+def get_peak_memory(scenario, scale = 1, autosave = False):
+    # Run the scenario again with tracemalloc on, without timing it (The largest amount of memory that Python had allocated during the frames)
+    main = create_main(autosave)
+    script = ScriptedInput()
+    tracemalloc.start()
+    for step in scenario(main, script, scale):
+        dirty_rects = main.editor.run(1 / 60)
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if autosave:
+        main.editor.autosave.stop()
+    return peak_memory
+
+def run_scenario(scenario, scale = 1, autosave = False):
+    main = create_main(autosave)
+    script = ScriptedInput()
+    phase_times = {}
+    time_phases(main, phase_times)
+    originals = {"Surface": pygame.Surface, "functions": [getattr(module, function_name) for module, function_name in ALLOCATING_FUNCTIONS]}
+    allocations = [0] # Surfaces created while drawing the level, one value per frame
+    count_allocations(main, allocations)
+
+    frame_times = []
+    for step in scenario(main, script, scale):
+        allocations[-1] = 0 # Anything created by the scenario itself isn't counted
+        start = time.perf_counter()
+        dirty_rects = main.editor.run(1 / 60)
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+        frame_times.append(time.perf_counter() - start)
+        allocations.append(0)
+    allocations.pop()
+    restore_allocations(originals)
+    if autosave:
+        main.editor.autosave.stop()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None # The largest the whole process has been so far
+
+    frame_times.sort()
+    return {
+        "frames": len(frame_times),
+        "mean_ms": sum(frame_times) / len(frame_times) * 1000,
+        "p50_ms": get_percentile(frame_times, 50) * 1000,
+        "p90_ms": get_percentile(frame_times, 90) * 1000,
+        "p99_ms": get_percentile(frame_times, 99) * 1000,
+        "max_ms": frame_times[-1] * 1000,
+        "phases_ms_per_frame": {phase: total / len(frame_times) * 1000 for phase, total in phase_times.items()},
+        "surface_allocations": sum(allocations),
+        "allocating_frames": sum(1 for frame_allocations in allocations if frame_allocations), # Frames that created at least one surface while drawing the level
+        "peak_python_memory_mb": get_peak_memory(scenario, scale, autosave) / 1024 / 1024,
+        "max_rss_mb": max_rss,
+    }
+
+def print_result(name, result):
+    print(f"{name}: {result['frames']} frames, mean {result['mean_ms']:.2f} ms, p50 {result['p50_ms']:.2f} ms, p90 {result['p90_ms']:.2f} ms, "
+          f"p99 {result['p99_ms']:.2f} ms, max {result['max_ms']:.2f} ms, peak python memory {result['peak_python_memory_mb']:.1f} MB, max rss {result['max_rss_mb'] or 0:.0f} MB")
+    print(f"    surfaces created while drawing the level: {result['surface_allocations']} (in {result['allocating_frames']} of {result['frames']} frames)")
+    for phase, ms in result["phases_ms_per_frame"].items():
+        print(f"    {phase}: {ms:.3f} ms/frame")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Run the editor benchmarks without a window")
+    parser.add_argument("scenarios", nargs = "*", default = list(SCENARIOS), help = "The scenarios to run (all of them by default)")
+    parser.add_argument("--scale", type = int, default = 1, help = "Multiplies the amount of work in each scenario")
+    parser.add_argument("--autosave", action = "store_true", help = "Run with autosave on (compare with a run without it to find the cost of autosave)")
+    parser.add_argument("--json", help = "Save the results to this file, so that they can be compared over time")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.scenarios:
+        results[name] = run_scenario(SCENARIOS[name], args.scale, args.autosave)
+        print_result(name, results[name])
+
+    if args.json:
+        with open(args.json, "w") as results_file:
+            json.dump(results, results_file, indent = 4)
@@ -0,0 +1,109 @@
+from settings import *
+
+class ChunkedCanvas:
+    """ Stores the canvas tiles in square chunks of CHUNK_SIZE x CHUNK_SIZE cells.
+    - It behaves like the old canvas_data dictionary (cell_pos: tile), so canvas_data[cell] and "cell in canvas_data" still work
+    - The difference is that we can ask for only the chunks that are inside of an area (e.g. the window), instead of looking at every tile in the level
+    """
+    def __init__(self, chunk_size = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.chunks = {} # Chunk pos: {cell pos: tile}
+        self.cell_count = 0
+        self.edited_chunks = set() # Chunks that have changed since the level was last saved
+        self.changed_cells = None # Cells that have changed since the last autosave (This is only a set while autosave is on, see autosave.py)
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # SUPPORT
+    def get_chunk_pos(self, cell_pos):
+        # Floor division rounds down, so negative cells end up in the correct chunk e.g. cell -1 is in chunk -1, not chunk 0
+        return (cell_pos[0] // self.chunk_size, cell_pos[1] // self.chunk_size)
+
+    def chunks_in_area(self, topleft_cell, bottomright_cell):
+        # Find the chunks that the corners of the area are inside of
+        left, top = self.get_chunk_pos(topleft_cell)
+        right, bottom = self.get_chunk_pos(bottomright_cell)
+
+        # Only look at the chunks that overlap the area (The amount of chunks depends on the size of the area, not the size of the level)
+        for chunk_row in range(top, bottom + 1):
+            for chunk_col in range(left, right + 1):
+                chunk = self.chunks.get((chunk_col, chunk_row))
+                # Empty chunks are not stored, so skip them
+                if chunk:
+                    yield (chunk_col, chunk_row), chunk
+
+    def items_in_area(self, topleft_cell, bottomright_cell):
+        for chunk_pos, chunk in self.chunks_in_area(topleft_cell, bottomright_cell):
+            yield from chunk.items()
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Dictionary methods
+    def __contains__(self, cell_pos):
+        chunk = self.chunks.get(self.get_chunk_pos(cell_pos))
+        return chunk is not None and cell_pos in chunk
+
+    def __getitem__(self, cell_pos):
+        chunk = self.chunks.get(self.get_chunk_pos(cell_pos))
+        if chunk is None:
+            raise KeyError(cell_pos)
+        return chunk[cell_pos]
+
+    def __setitem__(self, cell_pos, tile):
+        # Create the chunk if this is the first tile inside of it
+        chunk_pos = self.get_chunk_pos(cell_pos)
+        chunk = self.chunks.setdefault(chunk_pos, {})
+        self.edited_chunks.add(chunk_pos)
+        if self.changed_cells is not None:
+            self.changed_cells.add(cell_pos)
+        if cell_pos not in chunk:
+            self.cell_count += 1
+        chunk[cell_pos] = tile
+
+    def __delitem__(self, cell_pos):
+        chunk_pos = self.get_chunk_pos(cell_pos)
+        chunk = self.chunks.get(chunk_pos)
+        if chunk is None:
+            raise KeyError(cell_pos)
+        del chunk[cell_pos]
+        self.cell_count -= 1
+        self.edited_chunks.add(chunk_pos)
+        if self.changed_cells is not None:
+            self.changed_cells.add(cell_pos)
+        # Remove empty chunks so that they are not visited when drawing
+        if not chunk:
+            del self.chunks[chunk_pos]
+
+    def update(self, tiles):
+        # Add many tiles at once (cell pos: tile), looking up each chunk once instead of once for every tile
+        chunk_size = self.chunk_size
+        chunk_pos = chunk = None
+        for cell_pos, tile in tiles.items():
+            if (cell_pos[0] // chunk_size, cell_pos[1] // chunk_size) != chunk_pos:
+                chunk_pos = (cell_pos[0] // chunk_size, cell_pos[1] // chunk_size)
+                chunk = self.chunks.setdefault(chunk_pos, {})
+                self.edited_chunks.add(chunk_pos)
+            if cell_pos not in chunk:
+                self.cell_count += 1
+            chunk[cell_pos] = tile
+        if self.changed_cells is not None:
+            self.changed_cells.update(tiles)
+
+    def load_chunk(self, chunk_pos, tiles):
+        # Add a chunk that was read from a level file (It hasn't been edited, so it doesn't need to be saved again)
+        chunk = self.chunks.setdefault(chunk_pos, {})
+        self.cell_count += len(tiles) - len(chunk.keys() & tiles.keys())
+        chunk.update(tiles)
+
+    def get(self, cell_pos, default = None):
+        chunk = self.chunks.get(self.get_chunk_pos(cell_pos))
+        return chunk.get(cell_pos, default) if chunk is not None else default
+
+    def __len__(self):
+        return self.cell_count
+
+    def __iter__(self):
+        for chunk in self.chunks.values():
+            yield from chunk
+
+    def items(self):
+        for chunk in self.chunks.values():
+            yield from chunk.items()
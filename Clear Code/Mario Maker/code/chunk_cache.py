@@ -0,0 +1,122 @@
+import pygame
+from collections import OrderedDict
+from settings import *
+
+class ChunkCache:
+    """ Keeps a pre-rendered surface for each chunk of one layer of the canvas, so that a chunk that hasn't changed only costs one blit to draw.
+    - A chunk is only re-rendered after it has been marked as dirty (when one of its cells has changed)
+    - A chunk that has nothing to draw on this layer doesn't get a surface at all
+    - Animated graphics (water, coins and enemies) are not part of the chunk surface. Each chunk keeps a list of its animated tiles instead, which are drawn on top of it every frame (so the chunk doesn't need to be rendered again when the animation moves on)
+    - The surfaces are kept in least recently used order. The memory budget is shared by the chunk caches of every layer, so the chunks that haven't been drawn for the longest time are removed by LevelLayers (see layers.py)
+    """
+    def __init__(self, canvas_data, draw_tile, has_static_graphics, get_animated_ids, get_frame_bounds):
+        self.canvas_data = canvas_data
+        self.draw_tile = draw_tile # Function used to draw the graphics of a single tile that don't move onto a surface, draw_tile(surface, tile, pos)
+        self.has_static_graphics = has_static_graphics # Function that returns True if draw_tile would draw anything for a tile
+        self.get_animated_ids = get_animated_ids # Function that returns the ids of the animations of a tile on this layer (an empty tuple if it has none)
+        self.get_frame_bounds = get_frame_bounds # Function that returns the area covered by the frames of an animation, relative to the top-left of the cell
+
+        self.tile_size = TILE_SIZE # The size of a tile at the current zoom level
+        self.chunk_pixel_size = self.canvas_data.chunk_size * self.tile_size
+        self.surfaces = OrderedDict() # Chunk pos: surface (The least recently used chunk is at the start)
+        self.dirty_chunks = set()
+        self.memory_used = 0 # In bytes
+
+        # Animated tiles
+        self.animated = {} # Chunk pos: (list of (cell pos, animation ids), area of the screen covered by the animations relative to the top-left of the chunk)
+        self.visible_chunks = set() # The chunks that were drawn in the last frame
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # SUPPORT
+    def mark_chunks_dirty(self, chunk_positions):
+        # The tiles in these chunks have changed, so the chunks need to be rendered again
+        self.dirty_chunks.update(chunk_positions)
+
+    def set_tile_size(self, tile_size):
+        # After zooming, every chunk needs to be rendered again at the new size
+        self.tile_size = tile_size
+        self.chunk_pixel_size = self.canvas_data.chunk_size * tile_size
+        self.surfaces.clear()
+        self.animated.clear()
+        self.memory_used = 0
+
+    def get_surface_size(self, surface):
+        # Bytes used by the pixels of the surface
+        return surface.get_pitch() * surface.get_height()
+
+    def remove(self, chunk_pos):
+        self.animated.pop(chunk_pos, None)
+        surface = self.surfaces.pop(chunk_pos, None)
+        if surface:
+            self.memory_used -= self.get_surface_size(surface)
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Rendering
+    def render_chunk(self, chunk_pos, chunk):
+        # The top-left cell of the chunk, used to find the position of each tile inside of the chunk surface
+        first_column = chunk_pos[0] * self.canvas_data.chunk_size
+        first_row = chunk_pos[1] * self.canvas_data.chunk_size
+        static_tiles = []
+        animated_tiles = []
+        animated_areas = []
+        for cell_pos, tile in chunk.items():
+            pos = ((cell_pos[0] - first_column) * self.tile_size, (cell_pos[1] - first_row) * self.tile_size)
+            if self.has_static_graphics(tile):
+                static_tiles.append((tile, pos))
+
+            # Remember the animated tiles, so that they can be drawn on top of the chunk
+            animation_ids = self.get_animated_ids(tile)
+            if animation_ids:
+                animated_tiles.append((cell_pos, animation_ids))
+                animated_areas.extend(self.get_frame_bounds(animation_id).move(pos) for animation_id in animation_ids)
+
+        if animated_tiles:
+            self.animated[chunk_pos] = (animated_tiles, animated_areas[0].unionall(animated_areas))
+        else:
+            self.animated.pop(chunk_pos, None)
+
+        # Re-use the old surface of this chunk if there is one, otherwise create a new one (None if there is nothing to draw)
+        surface = self.surfaces.get(chunk_pos)
+        if static_tiles:
+            if surface:
+                surface.fill((0, 0, 0, 0)) # Clear the surface (fill it with a transparent colour)
+            else:
+                surface = pygame.Surface((self.chunk_pixel_size, self.chunk_pixel_size), pygame.SRCALPHA)
+                self.memory_used += self.get_surface_size(surface)
+            for tile, pos in static_tiles:
+                self.draw_tile(surface, tile, pos)
+        elif surface:
+            self.memory_used -= self.get_surface_size(surface)
+            surface = None
+
+        self.surfaces[chunk_pos] = surface
+        self.dirty_chunks.discard(chunk_pos)
+        return surface
+
+    def get_surface(self, chunk_pos, chunk):
+        # Only render the chunk again if it has changed or if it isn't in the cache (e.g. it was evicted)
+        if chunk_pos in self.dirty_chunks or chunk_pos not in self.surfaces:
+            surface = self.render_chunk(chunk_pos, chunk)
+        else:
+            surface = self.surfaces[chunk_pos]
+
+        # Move the chunk to the end, as it is now the most recently used chunk
+        self.surfaces.move_to_end(chunk_pos)
+        return surface
+
+    def remove_empty_chunks(self):
+        # Remove chunks that no longer have any tiles (e.g. all of their tiles were erased)
+        for chunk_pos in [chunk_pos for chunk_pos in self.surfaces if chunk_pos not in self.canvas_data.chunks]:
+            self.remove(chunk_pos)
+
+    def draw(self, display_surface, origin, topleft_cell, bottomright_cell):
+        visible_chunks = set()
+        for chunk_pos, chunk in self.canvas_data.chunks_in_area(topleft_cell, bottomright_cell):
+            visible_chunks.add(chunk_pos)
+            # Start from the origin point, not the start of the screen
+            surface = self.get_surface(chunk_pos, chunk)
+            if surface:
+                display_surface.blit(surface, (origin.x + chunk_pos[0] * self.chunk_pixel_size, origin.y + chunk_pos[1] * self.chunk_pixel_size))
+
+        self.visible_chunks = visible_chunks
+        self.remove_empty_chunks()
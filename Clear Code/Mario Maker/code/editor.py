@@ -1,18 +1,35 @@
-import pygame, sys
+import pygame, sys, os
 from pygame.math import Vector2 as vector
 from pygame.mouse import get_pressed as mouse_buttons
 from pygame.mouse import get_pos as mouse_pos
+from pygame.key import get_pressed as keys_pressed
 from settings import *
 from menu import Menu
+from canvas import ChunkedCanvas
+from layers import LevelLayers
+from level_file import LevelFile, write_level, encode_chunks, HAS_TERRAIN, HAS_WATER, WATER_ON_TOP
+from history import History, CELL_STATE, ERASED
+from autotile import NEIGHBOUR_OFFSETS, create_masks, numpy
+from zoom import ScaledTileCache
+from minimap import Minimap
+from animation import AnimationClock
 
 class Editor: 
-    def __init__(self, land_tiles):
+    def __init__(self, land_tiles, assets, level_path = None):
         # Main set-up
         self.display_surface = pygame.display.get_surface()
-        self.canvas_data = {}
+        self.canvas_data = ChunkedCanvas() # Works like a dictionary of cell_pos: tile, but is split into chunks so that only the visible part of the level is drawn
 
         # Imports
         self.land_tiles = land_tiles # Import graphics
+        self.assets = assets # Loads the graphics of the editor data when they are needed
+
+        # Zoom (SHIFT + mouse wheel, or the + and - keys). The graphics are scaled once for each zoom level (see zoom.py)
+        self.tile_cache = ScaledTileCache(self.land_tiles, self.assets)
+        self.zoom_index = ZOOM_TILE_SIZES.index(TILE_SIZE)
+        self.tile_size = TILE_SIZE
+        self.tile_set = self.tile_cache.get_tile_set(self.tile_size)
+        self.terrain_table = self.tile_set.terrain_table # The land tile for each of the 256 possible neighbour masks
 
         # Navigation 
         self.origin = vector() # Origin is a vector
@@ -20,108 +37,496 @@ class Editor:
         self.pan_offset = vector() # The distance/offset between the mouse pos and the origin
 
         # Support lines
-        self.support_line_surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-        self.support_line_surface.set_colorkey("green") # Removes any colour with the colour green
-        self.support_line_surface.set_alpha(30) # Set the transparency of the support line surface
+        self.support_line_surface = None # The lines are only drawn once, then the same surface is moved around (See create_support_lines)
+        self.support_line_size = None # The window size and tile size that the support lines were drawn for
 
         # Selection
         self.selection_index = 2
         self.last_selected_cell = None
 
+        # Tools (B = brush, R = rectangle, F = flood fill). The left mouse button adds the selected tile, the right mouse button erases
+        self.tool = "brush"
+        self.rect_start_cell = None # The cell where the rectangle tool started dragging from
+        self.rect_button = None # The mouse button that is dragging the rectangle
+        self.rect_preview = None # The area of the screen covered by the rectangle preview
+
+        # Undo / redo (CTRL + Z / CTRL + Y)
+        self.history = History()
+
         # Menu
-        self.menu = Menu()
+        self.menu = Menu(self.assets)
+
+        # Minimap (Clicking on it moves the screen to that part of the level)
+        self.minimap = Minimap(self.canvas_data)
+
+        # Layers of the level, each with its own pre-rendered chunks (Chunks are only drawn again when one of their cells on that layer has changed)
+        # The water is on the water layer, the terrain, coins and enemies are on the main layer (The editor can't place palms yet, so the bg layer has no tiles)
+        self.layers = LevelLayers(self.canvas_data, self.assets, {
+            "water": (self.draw_water_tile, self.has_water_bottom, self.get_water_ids),
+            "main": (self.draw_tile, self.has_terrain, self.get_item_ids)},
+            get_frame_bounds = self.get_frame_bounds)
+
+        # Animations (The water, coins and enemies are drawn on top of the chunks, so the chunks don't need to be rendered again for each frame of the animations)
+        self.animation_clock = AnimationClock()
+
+        # Dirty rectangles (the areas of the window that have changed since the last frame and need to be drawn again)
+        self.redraw_all = True # The whole window needs to be drawn e.g. on the first frame or after panning
+        self.dirty_rects = []
+        self.drawn_origin = vector(self.origin) # The origin that the last frame was drawn with
+        self.animating = False # Set when something on the screen is animated, so the animated areas are drawn again on each frame of the animations
+
+        # Input (the events, mouse and keyboard are read once per frame, see get_input)
+        self.input = InputSnapshot([], mouse_pos(), mouse_buttons(), keys_pressed())
+
+        # Level file (CTRL + S saves). Only the chunks near the origin are read from the file, the rest are read as the level is panned around
+        self.level_path = level_path or LEVEL_PATH
+        self.level_file = LevelFile(level_path) if level_path and os.path.exists(level_path) else None
+        self.streamed_chunks = set() # Chunks of the level file that have been read into the canvas
+        self.stream_chunks()
+        if self.level_file:
+            # Show where the rest of the level is on the minimap, before it has been read
+            for chunk_pos in self.level_file.index.keys() - self.streamed_chunks:
+                self.minimap.add_chunk_outline(chunk_pos)
+        self.autosave = None # Set by Main when autosave is on (see autosave.py)
     # ------------------------------------------------------------------------------------------------------------------------
     # SUPPORT
     def get_current_cell(self):
-        distance_to_origin = vector(mouse_pos()) - self.origin # vector(x = mouse_pos()[0] - self.origin.x , y = mouse_pos()[1] - self.origin.y)
+        distance_to_origin = vector(self.input.mouse_pos) - self.origin # vector(x = mouse_pos[0] - self.origin.x , y = mouse_pos[1] - self.origin.y)
         #print(distance_to_origin, self.origin)
 
         # In the case that the column not negative 
         if distance_to_origin.x > 0:
             # Find the column cell that was clicked
-            column = int(distance_to_origin.x / TILE_SIZE)
+            column = int(distance_to_origin.x / self.tile_size)
         # In the case that the column is negative
         else:
             # For more info go to 1:54:00 in the video
-            column = int(distance_to_origin.x / TILE_SIZE) - 1
+            column = int(distance_to_origin.x / self.tile_size) - 1
 
         # Do the same for the rows
         if distance_to_origin.y > 0:
-            row = int(distance_to_origin.y / TILE_SIZE)
+            row = int(distance_to_origin.y / self.tile_size)
         else: 
-            row = int(distance_to_origin.y / TILE_SIZE) - 1
+            row = int(distance_to_origin.y / self.tile_size) - 1
 
 
         return column, row
+
+    def get_visible_cells(self):
+        # The cells at the top-left and bottom-right corners of the window (floor division, so that negative cells are rounded down)
+        topleft_cell = (int(-self.origin.x // self.tile_size), int(-self.origin.y // self.tile_size))
+        bottomright_cell = (int((WINDOW_WIDTH - self.origin.x) // self.tile_size), int((WINDOW_HEIGHT - self.origin.y) // self.tile_size))
+        return topleft_cell, bottomright_cell
+
+    def get_stroke_cells(self, start_cell, end_cell):
+        """ The cells on the line between two cells (Bresenham's line algorithm), not including the start cell.
+        - Used when the mouse moves more than one cell in a frame, so that a fast drag doesn't skip any cells
+        """
+        x, y = start_cell
+        end_x, end_y = end_cell
+        distance_x, distance_y = abs(end_x - x), -abs(end_y - y)
+        step_x = 1 if x < end_x else -1
+        step_y = 1 if y < end_y else -1
+        error = distance_x + distance_y
+
+        cells = []
+        while (x, y) != (end_x, end_y):
+            # Move along x, y or both (whichever keeps the line closest to the real line)
+            double_error = error * 2
+            if double_error >= distance_y:
+                error += distance_y
+                x += step_x
+            if double_error <= distance_x:
+                error += distance_x
+                y += step_y
+            cells.append((x, y))
+        return cells
+
+    def update_neighbours(self, cells):
+        # Update the terrain masks after changing a group of cells, checking each affected cell only once (instead of once for every changed cell around it)
+        if len(cells) == 1:
+            # Only one cell has changed, so only the bits that point at that cell need to change
+            self.check_neighbours(cells[0])
+            return
+
+        # For large, dense areas (e.g. a rectangle fill) re-tile the area around the cells in one go with numpy
+        left = min(cell_pos[0] for cell_pos in cells)
+        top = min(cell_pos[1] for cell_pos in cells)
+        right = max(cell_pos[0] for cell_pos in cells)
+        bottom = max(cell_pos[1] for cell_pos in cells)
+        if numpy is not None and len(cells) >= 64 and (right - left + 3) * (bottom - top + 3) <= len(cells) * 4:
+            # Includes a border of 1 cell, as the neighbours of the cells at the edges can change as well
+            self.retile_region((left - 1, top - 1), (right + 1, bottom + 1))
+            return
+
+        # The changed cells and their neighbours
+        affected_cells = {(cell_pos[0] + column, cell_pos[1] + row) for cell_pos in cells for column in (-1, 0, 1) for row in (-1, 0, 1)}
+        for cell_pos in affected_cells:
+            tile = self.canvas_data.get(cell_pos)
+            if tile:
+                terrain_mask = self.get_terrain_mask(cell_pos)
+                if tile.terrain_mask != terrain_mask:
+                    tile.terrain_mask = terrain_mask
+                    self.layers.mark_dirty(cell_pos, "main")
+
+    def update_water(self, cells):
+        # Water with more water above it is drawn with the still water bottom graphic (only the top row of water is animated)
+        # Only the changed cells and the cells below them can change
+        get_tile = self.canvas_data.get
+        for cell_pos in {(cell_pos[0], cell_pos[1] + row) for cell_pos in cells for row in (0, 1)}:
+            tile = get_tile(cell_pos)
+            if tile:
+                top_tile = get_tile((cell_pos[0], cell_pos[1] - 1))
+                water_on_top = tile.has_water and top_tile is not None and top_tile.has_water
+                if tile.water_on_top != water_on_top:
+                    tile.water_on_top = water_on_top
+                    self.layers.mark_dirty(cell_pos, "water")
+
+    def set_cells(self, cells, tile_id):
+        # Add a tile id to many cells at once (or erase them if tile_id is None), then update their neighbours in one go
+        if not cells:
+            return
+
+        # Remember what the cells were before they changed (for undo)
+        self.history.record(self.canvas_data, cells)
+
+        new_tiles = {}
+        for cell_pos in cells:
+            tile = self.canvas_data.get(cell_pos)
+            if tile_id is None:
+                if tile:
+                    del self.canvas_data[cell_pos]
+            # If the cell already has a canvas tile
+            elif tile:
+                tile.add_id(tile_id) # This is basically updating an existing tile
+            else:
+                # Create a canvas tile, passing the index into the tile (which will determine what tile it is)
+                new_tiles[cell_pos] = CanvasTile(tile_id) # This is creating a new tile (as there isn't an existing tile there)
+        self.canvas_data.update(new_tiles)
+        self.update_cells(cells)
+
+    def update_cells(self, cells):
+        # After the contents of some cells have changed, update their neighbours and mark them to be drawn and saved again
+        if self.canvas_data.changed_cells is not None:
+            self.canvas_data.changed_cells.update(cells)
+
+        # The chunks that the cells are inside of need to be rendered again
+        chunk_size = self.canvas_data.chunk_size
+        self.layers.mark_chunks_dirty({(cell_pos[0] // chunk_size, cell_pos[1] // chunk_size) for cell_pos in cells})
+
+        self.update_neighbours(cells)
+        self.update_water(cells)
+
+        # Only the pixels of these cells are drawn again on the minimap
+        self.minimap.update_cells(cells)
+        self.dirty_rects.append(self.minimap.rect)
+
+        # A few cells (e.g. a brush stroke) are marked separately, many cells (e.g. a fill) are marked with one rectangle around them
+        if len(cells) <= 16:
+            for cell_pos in cells:
+                self.mark_cell_dirty(cell_pos)
+        else:
+            self.mark_area_dirty(cells)
+
+    def apply_cell_states(self, records):
+        # Set each cell to the state stored in the records (see history.py), then update all of their neighbours in one go
+        cells = []
+        for column, row, flags, coin, enemy in CELL_STATE.iter_unpack(records):
+            cell_pos = (column, row)
+            cells.append(cell_pos)
+            if flags & ERASED:
+                if cell_pos in self.canvas_data:
+                    del self.canvas_data[cell_pos]
+            else:
+                # The terrain mask is calculated again by update_neighbours
+                self.canvas_data[cell_pos] = CanvasTile.from_record(bool(flags & HAS_TERRAIN), 0, bool(flags & HAS_WATER), bool(flags & WATER_ON_TOP), coin or None, enemy or None)
+        if cells:
+            self.update_cells(cells)
+
+    def get_flood_cells(self, start_cell):
+        """ The cells connected to the start cell (up, down, left and right) that hold the same thing as the start cell.
+        - If the start cell is empty, the fill is limited to the cells on the screen (otherwise it would never end)
+        """
+        def get_contents(cell_pos):
+            tile = self.canvas_data.get(cell_pos)
+            return (tile.has_terrain, tile.has_water, tile.coin, tile.enemy) if tile else None
+
+        start_contents = get_contents(start_cell)
+        (left, top), (right, bottom) = self.get_visible_cells()
+
+        cells = [start_cell]
+        found_cells = {start_cell}
+        for cell_pos in cells: # The list grows while we are looping through it (breadth first search)
+            if len(cells) >= FLOOD_FILL_LIMIT:
+                break
+            for side in ((0, -1), (1, 0), (0, 1), (-1, 0)):
+                neighbour_cell = (cell_pos[0] + side[0], cell_pos[1] + side[1])
+                if neighbour_cell in found_cells or get_contents(neighbour_cell) != start_contents:
+                    continue
+                if start_contents is None and not (left <= neighbour_cell[0] <= right and top <= neighbour_cell[1] <= bottom):
+                    continue
+                found_cells.add(neighbour_cell)
+                cells.append(neighbour_cell)
+        return cells
+
+    def get_rect_cells(self, start_cell, end_cell):
+        # Every cell inside of the rectangle between two corner cells
+        left, right = min(start_cell[0], end_cell[0]), max(start_cell[0], end_cell[0])
+        top, bottom = min(start_cell[1], end_cell[1]), max(start_cell[1], end_cell[1])
+        return [(column, row) for row in range(top, bottom + 1) for column in range(left, right + 1)]
+
+    def mark_area_dirty(self, cells):
+        # One rectangle around all of the cells (and their neighbours)
+        left = min(cell_pos[0] for cell_pos in cells)
+        top = min(cell_pos[1] for cell_pos in cells)
+        right = max(cell_pos[0] for cell_pos in cells)
+        bottom = max(cell_pos[1] for cell_pos in cells)
+        self.dirty_rects.append(pygame.Rect(self.origin.x + (left - 1) * self.tile_size, self.origin.y + (top - 1) * self.tile_size, (right - left + 3) * self.tile_size, (bottom - top + 3) * self.tile_size))
+
+    def mark_cell_dirty(self, cell_pos):
+        # The cell and its neighbours (the neighbours can change graphic as well) need to be drawn again
+        self.dirty_rects.append(pygame.Rect(self.origin.x + (cell_pos[0] - 1) * self.tile_size, self.origin.y + (cell_pos[1] - 1) * self.tile_size, self.tile_size * 3, self.tile_size * 3))
+
+    def is_over_panel(self, pos):
+        # The menu and the minimap are drawn over the canvas, so clicks on them don't change the canvas
+        return self.menu.rect.collidepoint(pos) or self.minimap.rect.collidepoint(pos)
+
+    def mark_menu_dirty(self):
+        # The menu area, including the highlight around the buttons
+        self.dirty_rects.append(self.menu.rect.inflate(10, 10))
+
+    def is_idle(self):
+        # Nothing needs to be drawn until the next event (or the next frame of the animations, see get_wait_time)
+        return not self.redraw_all and not self.dirty_rects
+
+    def get_wait_time(self):
+        # Milliseconds until the animations on the screen move on to their next frame (None if nothing on the screen is animated)
+        if not self.animating:
+            return None
+        return max(1, int(self.animation_clock.get_time_to_next_frame() * 1000) + 1)
+
+    def mark_animations_dirty(self):
+        # The areas covered by the animations of the chunks on the screen
+        for chunk_cache in self.layers.chunk_caches.values():
+            chunk_pixel_size = chunk_cache.chunk_pixel_size
+            for chunk_pos in chunk_cache.visible_chunks:
+                if chunk_pos in chunk_cache.animated:
+                    self.dirty_rects.append(chunk_cache.animated[chunk_pos][1].move(self.origin.x + chunk_pos[0] * chunk_pixel_size, self.origin.y + chunk_pos[1] * chunk_pixel_size))
     
-    def check_neighbours(self, cell_pos):
+    def get_terrain_mask(self, cell_pos):
+        # Find the mask of a cell, by switching on the bit of each neighbour that has terrain
+        terrain_mask = 0
+        for bit, side, opposite_bit in NEIGHBOUR_OFFSETS:
+            neighbour = self.canvas_data.get((cell_pos[0] + side[0], cell_pos[1] + side[1]))
+            if neighbour and neighbour.has_terrain:
+                terrain_mask |= bit
+        return terrain_mask
 
-        # Create a local cluster (the cells around the cell we are looking at)
-        cluster_size = 3
-        # List comprehension to make a list with the local cluster
-        local_cluster = [(cell_pos[0] + col - int(cluster_size / 2), cell_pos[1] + row - int(cluster_size / 2)) 
-        for col in range(cluster_size) 
-        for row in range(cluster_size)]
-
-        # Check neighbours of the cell
-        for cell in local_cluster:
-            # Check if any of the cells are an existing tile on the canvas
-            if cell in self.canvas_data:
-                # Set terrain neighbours to an empty list (to avoid adding pointless data)
-                self.canvas_data[cell].terrain_neighbours = []
-
-                # Check neighbours
-                for name, side in NEIGHBOR_DIRECTIONS.items():
-                    neighbour_cell = (cell[0] + side[0], cell[1] + side[1]) # Check all possibilities using neighbour directions
-                    # If the neighbour cell is an existing tile
-                    if neighbour_cell in self.canvas_data:
-                        # If it is a terrain tile
-                        if self.canvas_data[neighbour_cell].has_terrain: 
-                            self.canvas_data[cell].terrain_neighbours.append(name)
+    def check_neighbours(self, cell_pos):
+        tile = self.canvas_data.get(cell_pos) # This is None if the cell has been erased
+        has_terrain = tile is not None and tile.has_terrain
+
+        # Only re-render the chunk of this cell if its graphic has changed
+        if tile:
+            terrain_mask = self.get_terrain_mask(cell_pos)
+            if tile.terrain_mask != terrain_mask:
+                tile.terrain_mask = terrain_mask
+                self.layers.mark_dirty(cell_pos, "main")
+
+        # Update the bit that each neighbour uses for this cell (The rest of their bits stay the same)
+        for bit, side, opposite_bit in NEIGHBOUR_OFFSETS:
+            neighbour_cell = (cell_pos[0] + side[0], cell_pos[1] + side[1])
+            neighbour = self.canvas_data.get(neighbour_cell)
+            if neighbour:
+                neighbour_mask = neighbour.terrain_mask | opposite_bit if has_terrain else neighbour.terrain_mask & ~opposite_bit
+                if neighbour.terrain_mask != neighbour_mask:
+                    neighbour.terrain_mask = neighbour_mask
+                    self.layers.mark_dirty(neighbour_cell, "main")
+        
+    def retile_region(self, topleft_cell, bottomright_cell):
+        """ Re-calculate the terrain masks of every tile inside of a region in one go (e.g. after loading a level or filling a large area)
+        - This is much faster than calling check_neighbours for each cell, as the masks are calculated with numpy
+        """
+        left, top = topleft_cell
+        right, bottom = bottomright_cell
+
+        # Without numpy, check one cell at a time
+        if numpy is None:
+            for cell_pos, tile in self.canvas_data.items_in_area(topleft_cell, bottomright_cell):
+                if left <= cell_pos[0] <= right and top <= cell_pos[1] <= bottom:
+                    terrain_mask = self.get_terrain_mask(cell_pos)
+                    if tile.terrain_mask != terrain_mask:
+                        tile.terrain_mask = terrain_mask
+                        self.layers.mark_dirty(cell_pos, "main")
+            return
+
+        # Fill an array with the cells that have terrain, including a border of 1 cell around the region (so that the cells at the edges can see their neighbours)
+        width = right - left + 3
+        occupancy = numpy.zeros((bottom - top + 3, width), dtype = bool)
+        # The position of each terrain cell inside of the flattened array (row * width + column)
+        terrain_cells = [(cell_pos[1] - top + 1) * width + cell_pos[0] - left + 1
+                         for cell_pos, tile in self.canvas_data.items_in_area((left - 1, top - 1), (right + 1, bottom + 1))
+                         if tile.has_terrain and left - 1 <= cell_pos[0] <= right + 1 and top - 1 <= cell_pos[1] <= bottom + 1]
+        # Set all of the cells in one go
+        occupancy.flat[numpy.array(terrain_cells, dtype = numpy.intp)] = True
+
+        # Calculate all of the masks, then convert them into a list (Reading from a list is faster than reading single items from a numpy array)
+        masks = create_masks(occupancy).tolist()
+
+        # Write the masks back into the tiles
+        changed_cells = []
+        for chunk_pos, chunk in self.canvas_data.chunks_in_area(topleft_cell, bottomright_cell):
+            chunk_changed = False
+            for cell_pos, tile in chunk.items():
+                if left <= cell_pos[0] <= right and top <= cell_pos[1] <= bottom:
+                    terrain_mask = masks[cell_pos[1] - top][cell_pos[0] - left]
+                    if tile.terrain_mask != terrain_mask:
+                        tile.terrain_mask = terrain_mask
+                        changed_cells.append(cell_pos)
+                        chunk_changed = True
+
+            # Only re-render the chunks that have changed
+            if chunk_changed:
+                self.layers.mark_chunks_dirty([chunk_pos], "main")
+        if self.canvas_data.changed_cells is not None:
+            self.canvas_data.changed_cells.update(changed_cells)
         
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Level file
+    def stream_chunks(self):
+        # Read the chunks of the level file that are on the screen (or within LEVEL_STREAM_MARGIN chunks of it) and haven't been read yet
+        if not self.level_file:
+            return
+        (left, top), (right, bottom) = self.get_visible_cells()
+        left, top = self.canvas_data.get_chunk_pos((left, top))
+        right, bottom = self.canvas_data.get_chunk_pos((right, bottom))
+        for chunk_row in range(top - LEVEL_STREAM_MARGIN, bottom + LEVEL_STREAM_MARGIN + 1):
+            for chunk_col in range(left - LEVEL_STREAM_MARGIN, right + LEVEL_STREAM_MARGIN + 1):
+                chunk_pos = (chunk_col, chunk_row)
+                if chunk_pos in self.level_file.index and chunk_pos not in self.streamed_chunks:
+                    tiles = {record[0]: CanvasTile.from_record(*record[1:]) for record in self.level_file.read_chunk(chunk_pos)}
+                    self.canvas_data.load_chunk(chunk_pos, tiles)
+                    self.streamed_chunks.add(chunk_pos)
+                    self.minimap.update_cells(list(tiles))
+
+    def save_level(self):
+        # Only the chunks that have been edited since the last save are written (A new file has every chunk written)
+        if self.level_file:
+            self.level_file = self.level_file.save(self.canvas_data, self.canvas_data.edited_chunks)
+        else:
+            self.level_file = write_level(self.level_path, self.canvas_data.chunk_size, encode_chunks(self.canvas_data))
+        # The chunks that are loaded now match the file (Chunks that haven't been streamed in yet are still only in the file, so they are streamed as normal)
+        self.streamed_chunks.update(chunk_pos for chunk_pos in self.level_file.index if chunk_pos in self.canvas_data.chunks)
+        self.canvas_data.edited_chunks = set()
+        if self.autosave:
+            self.autosave.level_saved(self.level_path)
+
+    def history_hotkeys(self, event):
+        if event.type == pygame.KEYDOWN and self.input.keys[pygame.K_LCTRL] and event.key in (pygame.K_z, pygame.K_y):
+            # Finish the command that is being recorded first (e.g. if the mouse button is still held down)
+            self.history.end_command(self.canvas_data)
+            self.last_selected_cell = None
+            records = self.history.undo() if event.key == pygame.K_z else self.history.redo()
+            if records:
+                self.apply_cell_states(records)
+
+    def level_hotkeys(self, event):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_s and self.input.keys[pygame.K_LCTRL]:
+            self.save_level()
+
     # ------------------------------------------------------------------------------------------------------------------------
     # INPUT
-    def event_loop(self):
-        # Event handler
-        for event in pygame.event.get():
+    def get_input(self, events):
+        # Read the events, mouse and keyboard once, so that every part of the editor uses the same input for this frame
+        return InputSnapshot(events if events is not None else pygame.event.get(), mouse_pos(), mouse_buttons(), keys_pressed())
+
+    def event_loop(self, events = None):
+        # Event handler (Main can pass in the events, e.g. after waiting for the next event when the editor is idle)
+        self.input = self.get_input(events)
+        for event in self.input.events:
             if event.type == pygame.QUIT:
+                if self.autosave:
+                    self.autosave.stop()
                 pygame.quit()
                 sys.exit()
+
+            # The window has been uncovered, so everything needs to be drawn again
+            if event.type == pygame.WINDOWEXPOSED:
+                self.redraw_all = True
             
             self.pan_input(event)
+            self.zoom_input(event)
             self.selection_hotkeys(event)
+            self.tool_hotkeys(event)
+            self.level_hotkeys(event)
+            self.history_hotkeys(event)
             self.menu_click(event)
-            self.canvas_add()
+            self.minimap_click(event)
+            self.tool_input(event)
+
+        # These only need to happen once per frame (not once per event)
+        self.pan_update()
+        self.canvas_add()
 
     # Used to move the origin 
     def pan_input(self, event): 
         
         # Middle mouse button pressed / released
-        if event.type == pygame.MOUSEBUTTONDOWN and mouse_buttons()[1]:
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 2:
             self.pan_active = True
             # Calculate the offset between the mouse position and the origin
-            self.pan_offset = vector(mouse_pos()) - self.origin
-
-        # Middle mouse button is released
-        if not mouse_buttons()[1]:
-            self.pan_active = False
+            self.pan_offset = vector(self.input.mouse_pos) - self.origin
 
-        # Mouse wheel
-        if event.type == pygame.MOUSEWHEEL:
+        # Mouse wheel (SHIFT + mouse wheel zooms instead, see zoom_input)
+        if event.type == pygame.MOUSEWHEEL and not self.input.keys[pygame.K_LSHIFT]:
             """ Event.y refers to the mousewheel moving up and down. Up = 1, Down = -1
             - Move the origin's x co-ordinate based on whether the mousewheel moves up or down
             - It is decrementing because when we are scrolling right, all elements would move left"""
 
             # If the Left CTRL button is being pressed (and the mouse wheel is being moved), move it up or down based on the action
-            if pygame.key.get_pressed()[pygame.K_LCTRL]:
+            if self.input.keys[pygame.K_LCTRL]:
                 self.origin.y -= event.y * 50
             else:
                 self.origin.x -= event.y * 50 
 
+    def zoom_input(self, event):
+        # Zoom in and out around the mouse
+        if event.type == pygame.MOUSEWHEEL and self.input.keys[pygame.K_LSHIFT]:
+            self.set_zoom(self.zoom_index - event.y, self.input.mouse_pos)
+        # Zoom in and out around the centre of the window
+        if event.type == pygame.KEYDOWN and event.key in (pygame.K_EQUALS, pygame.K_KP_PLUS, pygame.K_MINUS, pygame.K_KP_MINUS):
+            direction = -1 if event.key in (pygame.K_EQUALS, pygame.K_KP_PLUS) else 1
+            self.set_zoom(self.zoom_index + direction, (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2))
+
+    def set_zoom(self, zoom_index, pos):
+        # ZOOM_TILE_SIZES goes from the most zoomed in to the most zoomed out
+        zoom_index = max(0, min(len(ZOOM_TILE_SIZES) - 1, zoom_index))
+        if zoom_index == self.zoom_index:
+            return
+        old_tile_size = self.tile_size
+        self.zoom_index = zoom_index
+        self.tile_size = ZOOM_TILE_SIZES[zoom_index]
+
+        # Move the origin so that the point of the level at pos stays in the same place on the screen
+        self.origin = vector(pos) - (vector(pos) - self.origin) * self.tile_size / old_tile_size
+        self.origin = vector(round(self.origin.x), round(self.origin.y))
+
+        # Use the graphics for this zoom level, and render the chunks again at the new size
+        self.tile_set = self.tile_cache.get_tile_set(self.tile_size)
+        self.terrain_table = self.tile_set.terrain_table
+        self.layers.set_tile_size(self.tile_size)
+        self.redraw_all = True
+        self.stream_chunks()
+
+    def pan_update(self):
+        # Middle mouse button is released
+        if not self.input.mouse_buttons[1]:
+            self.pan_active = False
+
         # Panning update
         if self.pan_active:
             # Move the origin by the distance that the mouse position has moved
-            self.origin = vector(mouse_pos()) - self.pan_offset
+            self.origin = vector(self.input.mouse_pos) - self.pan_offset
     
     def selection_hotkeys(self, event):
         # Check for if a key is being pressed (This is checking if a key is being pressed, not held)
@@ -134,117 +539,260 @@ class Editor:
                 self.selection_index -= 1    
             # Limit the highest and lowest the index can be
             self.selection_index = max(2, min(self.selection_index, 18)) 
+            self.mark_menu_dirty()
+
+    def tool_hotkeys(self, event):
+        if event.type == pygame.KEYDOWN:
+            tools = {pygame.K_b: "brush", pygame.K_r: "rectangle", pygame.K_f: "flood fill"}
+            if event.key in tools:
+                self.tool = tools[event.key]
+                self.rect_start_cell = None
+                self.last_selected_cell = None
 
     def menu_click(self, event):
         # If the button has been clicked
-        if event.type == pygame.MOUSEBUTTONDOWN and self.menu.rect.collidepoint(mouse_pos()):
+        if event.type == pygame.MOUSEBUTTONDOWN and self.menu.rect.collidepoint(self.input.mouse_pos):
             # Call the click method inside menus, which will check if the button is colliding with the mouse position
-            self.selection_index = self.menu.click(mouse_pos(), mouse_buttons())
-
-    # Triggered when clicking on the canvas
+            self.selection_index = self.menu.click(self.input.mouse_pos, self.input.mouse_buttons)
+            self.mark_menu_dirty()
+
+    def minimap_click(self, event):
+        # Move the origin so that the cell that was clicked on is in the middle of the window
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.minimap.bounds and self.minimap.rect.collidepoint(self.input.mouse_pos):
+            column, row = self.minimap.get_cell(self.input.mouse_pos)
+            self.origin = vector(WINDOW_WIDTH // 2 - column * self.tile_size, WINDOW_HEIGHT // 2 - row * self.tile_size)
+
+    # Rectangle and flood fill tools
+    def tool_input(self, event):
+        # Left click adds the selected tile, right click erases
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button in (1, 3) and not self.is_over_panel(self.input.mouse_pos):
+            tile_id = self.selection_index if event.button == 1 else None
+            if self.tool == "flood fill":
+                self.set_cells(self.get_flood_cells(self.get_current_cell()), tile_id)
+                self.history.end_command(self.canvas_data)
+            if self.tool == "rectangle":
+                self.rect_start_cell = self.get_current_cell()
+                self.rect_button = event.button
+
+        # Fill (or erase) the rectangle when the mouse button is released
+        if event.type == pygame.MOUSEBUTTONUP and self.rect_start_cell and event.button == self.rect_button:
+            tile_id = self.selection_index if self.rect_button == 1 else None
+            self.set_cells(self.get_rect_cells(self.rect_start_cell, self.get_current_cell()), tile_id)
+            self.history.end_command(self.canvas_data)
+            self.rect_start_cell = None
+
+    # Triggered when clicking on the canvas with the brush (once per frame)
     def canvas_add(self):
-        if mouse_buttons()[0] and not self.menu.rect.collidepoint(mouse_pos()): # If we are left-clicking and not clicking on the menu
-            current_cell = self.get_current_cell() 
+        # If we are not clicking, or we are clicking on the menu, the stroke has ended
+        if self.tool != "brush" or not (self.input.mouse_buttons[0] or self.input.mouse_buttons[2]) or self.is_over_panel(self.input.mouse_pos):
+            # The whole stroke is one command for undo
+            if self.last_selected_cell is not None:
+                self.history.end_command(self.canvas_data)
+            self.last_selected_cell = None
+            return
 
-            # If we have changed a cell that is different from the last cell (This additional check is to improve performance)
-            if current_cell != self.last_selected_cell:
-                # If the cell already has a canvas tile
-                if current_cell in self.canvas_data:
-                    self.canvas_data[current_cell].add_id(self.selection_index) # This is basically updating an existing tile
-                else:
-                    # Create a canvas tile, passing the index into the tile (which will determine what tile it is)
-                    self.canvas_data[current_cell] = CanvasTile(self.selection_index) # This is creating a new tile (as there isn't an existing tile there)
+        current_cell = self.get_current_cell() 
 
-                # Check the neighbours of the current cell
-                self.check_neighbours(current_cell)
-                # Set the last selected cell as the current cell
-                self.last_selected_cell = current_cell
+        # If we have changed a cell that is different from the last cell (This additional check is to improve performance)
+        if current_cell != self.last_selected_cell:
+            # If the mouse has moved by more than one cell since the last frame, paint every cell in between as well
+            cells = [current_cell] if self.last_selected_cell is None else self.get_stroke_cells(self.last_selected_cell, current_cell)
+
+            # Paint all of the cells and update their neighbours in one go (The right mouse button erases)
+            self.set_cells(cells, self.selection_index if self.input.mouse_buttons[0] else None)
+            # Set the last selected cell as the current cell
+            self.last_selected_cell = current_cell
 
 
     # ------------------------------------------------------------------------------------------------------------------------
     # Drawing
+    def create_support_lines(self, window_size, tile_size):
+        """ Draw the tile lines once onto a surface that is 1 tile larger than the window.
+        - Because the lines repeat every tile, moving this surface by up to 1 tile gives the lines for any origin position
+        - The lines are drawn with their transparency already in the colour (per-pixel alpha), so no colour key or surface alpha is needed when blitting
+        """
+        width, height = window_size[0] + tile_size, window_size[1] + tile_size
+        self.support_line_surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        line_colour = pygame.Color(LINE_COLOUR)
+        line_colour.a = 30 # Set the transparency of the support lines
+
+        # Draw a line for each column and row (The plus 1 is so that there is a line at the end of the surface)
+        for column in range(width // tile_size + 1):
+            x = column * tile_size
+            pygame.draw.line(self.support_line_surface, line_colour, (x, 0), (x, height)) # The x co-ordinate should be the same for columns
+        for row in range(height // tile_size + 1):
+            y = row * tile_size
+            pygame.draw.line(self.support_line_surface, line_colour, (0, y), (width, y))
+
+        # Run-length encode the surface, which makes blitting it much faster (most of the surface is completely transparent)
+        self.support_line_surface.set_alpha(255, pygame.RLEACCEL)
+        self.support_line_size = (window_size, tile_size)
+
     def draw_tile_lines(self):
-        columns = WINDOW_WIDTH // TILE_SIZE
-        rows = WINDOW_HEIGHT // TILE_SIZE
+        # When zoomed out this far, the lines would cover the tiles
+        if self.tile_size < MIN_SUPPORT_LINE_TILE_SIZE:
+            return
+
+        # Draw the support lines again if the window size or the tile size has changed
+        window_size = self.display_surface.get_size()
+        if self.support_line_size != (window_size, self.tile_size):
+            self.create_support_lines(window_size, self.tile_size)
 
         """ 
-        The main idea is that we create a new point to start drawing columns from, which is before the origin point. That way, we will always have tile lines on the screen.
-        This new point is created from finding the difference between the column before the origin point and where the origin point is
-        origin_offset.x = vector(x = 100 - int(100 / 64) * 64) ---> 100 - 64 = 36
-        origin_offset.x = vector(x = 128 - int(128 / 64) * 64) ---> 128 - 128 = 0
+        The main idea is that we find the distance between the origin point and the column/row before it. The tile lines are at this offset + every tile size.
+        Modulo is used so that the offset is always between 0 and the tile size (even when the origin is negative)
+        origin_offset.x = 100 % 64 ---> 36
+        origin_offset.x = 128 % 64 ---> 0
+        origin_offset.x = -100 % 64 ---> 28
 
         """ 
-        origin_offset = vector(x = self.origin.x - int(self.origin.x / TILE_SIZE) * TILE_SIZE , y = self.origin.y - int(self.origin.y / TILE_SIZE) * TILE_SIZE)
+        origin_offset = vector(x = self.origin.x % self.tile_size, y = self.origin.y % self.tile_size)
     
         pygame.draw.circle(self.display_surface, "blue", (origin_offset.x, origin_offset.y), 10) #un-comment this to visualise it
 
-        # Used to make the lines transparent
-        self.support_line_surface.fill("green")
-
-        # Draw a line for each column in the amount of columns
-        for column in range(columns + 1): # The plus 1 is so that an extra column is being drawn at the end of the screen when we scroll right
-            # Draw the columns from the offset x position
-            x = origin_offset.x + column *  TILE_SIZE
-            pygame.draw.line(self.support_line_surface, LINE_COLOUR, (x, 0), (x, WINDOW_HEIGHT)) # The x co-ordinate should be the same for columns
-
-        # Do the same for the rows
-        for row in range(rows + 1):
-            y = origin_offset.y + row * TILE_SIZE
-            pygame.draw.line(self.support_line_surface, LINE_COLOUR, (0, y), (WINDOW_WIDTH, y)) 
-
-        # Draw the transparent surface onto the main surface
-        self.display_surface.blit(self.support_line_surface, (0, 0))
+        # The support line surface starts 1 tile before the offset, so that there are lines on the whole screen
+        self.display_surface.blit(self.support_line_surface, (origin_offset.x - self.tile_size, origin_offset.y - self.tile_size))
     
+    def update_tool_preview(self):
+        # Area of the screen covered by the rectangle that is being dragged with the rectangle tool
+        if self.rect_start_cell:
+            cells = (self.rect_start_cell, self.get_current_cell())
+            left, top = min(cells[0][0], cells[1][0]), min(cells[0][1], cells[1][1])
+            right, bottom = max(cells[0][0], cells[1][0]), max(cells[0][1], cells[1][1])
+            rect = pygame.Rect(self.origin.x + left * self.tile_size, self.origin.y + top * self.tile_size, (right - left + 1) * self.tile_size, (bottom - top + 1) * self.tile_size)
+        else:
+            rect = None
+
+        # The old and new preview areas need to be drawn again
+        if rect != self.rect_preview:
+            self.dirty_rects.extend(preview.inflate(4, 4) for preview in (rect, self.rect_preview) if preview)
+            self.rect_preview = rect
+
+    def draw_tool_preview(self):
+        if self.rect_preview:
+            pygame.draw.rect(self.display_surface, LINE_COLOUR if self.rect_button == 1 else "red", self.rect_preview, 3)
+
+    def draw_tile(self, surface, tile, pos):
+        # Only the graphics that don't move are drawn onto the chunks (The rest is drawn by draw_animations)
+        # The mask of the tile is the index of its graphic in the terrain table
+        surface.blit(self.terrain_table[tile.terrain_mask], pos)
+
+    def draw_water_tile(self, surface, tile, pos):
+        # Water with more water on top of it
+        surface.blit(self.tile_set.water_bottom, pos)
+
+    def has_terrain(self, tile):
+        return tile.has_terrain
+
+    def has_water_bottom(self, tile):
+        return tile.has_water and tile.water_on_top
+
+    def get_water_ids(self, tile):
+        # The surface of the water is animated
+        return (WATER_ID,) if tile.has_water and not tile.water_on_top else ()
+
+    def get_item_ids(self, tile):
+        # The coins and enemies
+        if tile.coin and tile.enemy:
+            return (tile.coin, tile.enemy) # The enemy is drawn in front of the coin
+        if tile.coin or tile.enemy:
+            return (tile.coin or tile.enemy,)
+        return ()
+
+    def get_frame_bounds(self, tile_id):
+        return self.tile_set.frame_bounds[tile_id]
+
+    def draw_animations(self, chunk_cache):
+        """ Draw the animations of one layer on top of its chunks
+        - Every animation uses the same frame index from the animation clock, so the tiles don't need to keep their own
+        - Where each frame is drawn inside of a cell is already in the frame table, so each frame is just one blit (and no surfaces are created while drawing)
+        """
+        frame_index = self.animation_clock.frame_index
+        blit = self.display_surface.blit
+        frame_tables = self.tile_set.frame_tables
+        origin_x, origin_y = self.origin.x, self.origin.y
+        for chunk_pos in chunk_cache.visible_chunks:
+            if chunk_pos not in chunk_cache.animated:
+                continue
+            for cell_pos, animation_ids in chunk_cache.animated[chunk_pos][0]:
+                x, y = origin_x + cell_pos[0] * self.tile_size, origin_y + cell_pos[1] * self.tile_size
+                for animation_id in animation_ids:
+                    frame_table = frame_tables[animation_id]
+                    frame, offset = frame_table[frame_index % len(frame_table)]
+                    blit(frame, (x + offset[0], y + offset[1]))
+
     def draw_level(self):
-        # Iterate through the cell position and the tile index in the canvas items
-        for cell_pos, tile in self.canvas_data.items():
-            # Start from the origin point, not the start of the screen
-            pos = self.origin + vector(cell_pos) * TILE_SIZE # Cell pos is converted to a vector because you cannot multiply a tuple by something
-
-            # Terrain
-            if tile.has_terrain:
-                # Making a string following the graphics names e.g. ABCDE
-                terrain_string = "".join(tile.terrain_neighbours)
-                # If the terrain string does not exist in the imported graphics, use the generic tile "X"
-                terrain_style = terrain_string if terrain_string in self.land_tiles else "X"
-                self.display_surface.blit(self.land_tiles[terrain_style], pos)
-
-            # Water
-            if tile.has_water:
-                test_surface = pygame.Surface((TILE_SIZE, TILE_SIZE))
-                test_surface.fill("blue")
-                self.display_surface.blit(test_surface, pos)
-
-            # Coins
-            if tile.coin:
-                test_surface = pygame.Surface((TILE_SIZE, TILE_SIZE))
-                test_surface.fill("yellow")
-                self.display_surface.blit(test_surface, pos)
-
-            # Enemies
-            if tile.enemy:
-                test_surface = pygame.Surface((TILE_SIZE, TILE_SIZE))
-                test_surface.fill("red")
-                self.display_surface.blit(test_surface, pos)
+        # Each layer is drawn from the back to the front (Each chunk is one blit, the tiles are only drawn onto the chunk surface when the chunk has changed)
+        self.layers.draw(self.display_surface, self.origin, *self.get_visible_cells(), draw_animations = self.draw_animations)
+        self.animating = any(chunk_pos in chunk_cache.animated for chunk_cache in self.layers.chunk_caches.values() for chunk_pos in chunk_cache.visible_chunks)
 
 
     # ------------------------------------------------------------------------------------------------------------------------
     # Updating
-    def run(self, dt):
-        self.display_surface.fill("white")
-        self.draw_level()
+    def run(self, dt, events = None):
+        self.event_loop(events)
+        self.update_tool_preview()
+        if self.autosave:
+            self.autosave.update()
+
+        # Only the animated areas need to be drawn again when the animations move on to their next frame
+        if self.animation_clock.update(dt) and self.animating:
+            self.mark_animations_dirty()
+
+        # Panning moves everything on the screen, so the whole window needs to be drawn (and the chunks that are now near the screen are read from the level file)
+        if self.origin != self.drawn_origin:
+            self.stream_chunks()
+        if self.origin != self.drawn_origin or not DIRTY_RECT_RENDERING:
+            self.redraw_all = True
+
+        # Find the areas of the window to draw (Returns the areas that need to be updated on the display)
+        if self.redraw_all:
+            dirty_rects = [self.display_surface.get_rect()]
+        elif self.dirty_rects:
+            dirty_rects = self.dirty_rects
+        else:
+            return [] # Nothing has changed, so the last frame is still correct
+
+        # Only draw inside of the dirty rectangles (anything drawn outside of the clip area is skipped)
+        self.display_surface.set_clip(dirty_rects[0].unionall(dirty_rects[1:]))
+        self.draw_level() # The sky fills the whole window, so the window doesn't need to be cleared first
         self.draw_tile_lines()
-        self.event_loop()
+        self.draw_tool_preview()
         pygame.draw.circle(self.display_surface, "red", self.origin, 10)
         self.menu.display(index = self.selection_index)
+        self.minimap.draw(*self.get_visible_cells())
+        self.display_surface.set_clip(None)
+
+        self.redraw_all = False
+        self.dirty_rects = []
+        self.drawn_origin = vector(self.origin)
+        return dirty_rects
+
 
 
+class InputSnapshot:
+    # The input for one frame
+    __slots__ = ("events", "mouse_pos", "mouse_buttons", "keys")
+
+    def __init__(self, events, mouse_pos, mouse_buttons, keys):
+        self.events = events
+        self.mouse_pos = mouse_pos
+        self.mouse_buttons = mouse_buttons
+        self.keys = keys
+
+
+# The style of each tile id e.g. 2: "terrain", 4: "coin" (Created once, instead of every time a tile is added)
+TILE_STYLES = {key: value["style"] for key, value in EDITOR_DATA.items()}
+WATER_ID = next(key for key, style in TILE_STYLES.items() if style == "water")
 
 class CanvasTile:
+    # Using slots means that each tile doesn't need its own dictionary for its attributes, which saves a lot of memory on large levels
+    __slots__ = ("has_terrain", "terrain_mask", "has_water", "water_on_top", "coin", "enemy", "objects")
+
     def __init__(self, tile_id):
         # Terrain
         self.has_terrain = False
-        self.terrain_neighbours = []
+        self.terrain_mask = 0 # One bit for each neighbour that has terrain (See autotile.py)
 
         # Water 
         self.has_water = False
@@ -257,18 +805,23 @@ class CanvasTile:
         self.enemy = None # Same logic as the coin (only one type of enemy per tile)
 
         # Objects
-        self.objects = []
+        self.objects = None # Most tiles don't have any objects, so the list is only created when an object is added
 
         self.add_id(tile_id)
 
+    @classmethod
+    def from_record(cls, has_terrain, terrain_mask, has_water, water_on_top, coin, enemy):
+        # Create a tile from the values saved in a level file (see level_file.py)
+        tile = cls.__new__(cls)
+        tile.has_terrain, tile.terrain_mask = has_terrain, terrain_mask
+        tile.has_water, tile.water_on_top = has_water, water_on_top
+        tile.coin, tile.enemy, tile.objects = coin, enemy, None
+        return tile
 
     def add_id(self, tile_id):
-        # Create a new dictionary only with the index and the value inside of the values in "style" (Because it is a dictionary inside of a dictionary)
-        options = {key:value["style"] for key, value in EDITOR_DATA.items()}
         # Match case
-        match options[tile_id]: 
+        match TILE_STYLES[tile_id]: 
             case "terrain": self.has_terrain = True
             case "water": self.has_water = True
             case "coin": self.coin = tile_id # Change id of the coin (because there are different variants of coins)
             case "enemy": self.enemy = tile_id # Change id of the enemies (because there are different variants of enemies)
-
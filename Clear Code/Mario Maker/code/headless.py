@@ -0,0 +1,72 @@
+import os, sys
+
+""" Running the editor without a window (used by the benchmarks)
+- SDL's dummy video driver is used, so nothing is shown on the screen
+- The editor reads the mouse and keyboard with mouse_pos(), mouse_buttons() and keys_pressed(), which can't be changed without a real mouse and keyboard. ScriptedInput replaces them and posts the matching events, as if a user was using the editor
+"""
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+# The graphics paths in the settings are relative to the Mario Maker folder
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pygame
+import editor
+
+class ScriptedInput:
+    def __init__(self):
+        self.pos = (0, 0)
+        self.buttons = [False, False, False] # Left, middle, right
+        self.held_keys = set() # Keys that are being held down
+
+        # Replace the mouse and keyboard functions that the editor uses
+        editor.mouse_pos = self.get_pos
+        editor.mouse_buttons = self.get_pressed
+        editor.keys_pressed = self.get_keys
+
+    def get_pos(self):
+        return self.pos
+
+    def get_pressed(self, num_buttons = 3):
+        return tuple(self.buttons)
+
+    def get_keys(self):
+        # Works like pygame.key.get_pressed(), keys_pressed()[key] is True if the key is held down
+        return KeyState(self.held_keys)
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Events
+    def move(self, pos):
+        rel = (pos[0] - self.pos[0], pos[1] - self.pos[1])
+        self.pos = pos
+        pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos = pos, rel = rel, buttons = tuple(self.buttons)))
+
+    def press(self, button):
+        # Button 1 = left, 2 = middle, 3 = right (the same as pygame)
+        self.buttons[button - 1] = True
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos = self.pos, button = button))
+
+    def release(self, button):
+        self.buttons[button - 1] = False
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONUP, pos = self.pos, button = button))
+
+    def wheel(self, y):
+        pygame.event.post(pygame.event.Event(pygame.MOUSEWHEEL, x = 0, y = y, flipped = False))
+
+    def hold_key(self, key, held = True):
+        if held:
+            self.held_keys.add(key)
+        else:
+            self.held_keys.discard(key)
+
+    def key(self, key):
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key = key, mod = 0, unicode = "", scancode = 0))
+        pygame.event.post(pygame.event.Event(pygame.KEYUP, key = key, mod = 0, unicode = "", scancode = 0))
+
+class KeyState:
+    def __init__(self, held_keys):
+        self.held_keys = held_keys
+
+    def __getitem__(self, key):
+        return key in self.held_keys
@@ -0,0 +1,84 @@
+import struct
+from collections import deque
+from settings import *
+from level_file import HAS_TERRAIN, HAS_WATER, WATER_ON_TOP, ERASED
+
+""" Undo and redo
+- Each command (a brush stroke, a rectangle or a flood fill) only stores the cells that it changed, as they were before and after the command
+- The cells are stored as fixed size records (the terrain masks aren't stored, as they are calculated again from the neighbours when a command is undone or redone)
+- Once the commands use more than HISTORY_MEMORY_BUDGET bytes, the oldest commands are removed
+"""
+CELL_STATE = struct.Struct("<iiBBB") # Column, row, flags, coin id, enemy id
+
+def get_cell_state(tile):
+    # The contents of a cell as (flags, coin id, enemy id)
+    if tile is None:
+        return (ERASED, 0, 0)
+    return ((HAS_TERRAIN if tile.has_terrain else 0) | (HAS_WATER if tile.has_water else 0) | (WATER_ON_TOP if tile.water_on_top else 0), tile.coin or 0, tile.enemy or 0)
+
+class History:
+    def __init__(self, memory_budget = HISTORY_MEMORY_BUDGET):
+        self.memory_budget = memory_budget # In bytes
+        self.undo_stack = deque() # (before records, after records) for each command (The oldest command is at the start)
+        self.redo_stack = []
+        self.memory_used = 0
+        self.before = None # Cell pos: state before the command that is being recorded (None if no command is being recorded)
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # SUPPORT
+    def get_command_size(self, command):
+        return len(command[0]) + len(command[1])
+
+    def evict(self):
+        # Remove the oldest commands until we are within the memory budget (never removing the command that was just added)
+        while self.memory_used > self.memory_budget and len(self.undo_stack) > 1:
+            self.memory_used -= self.get_command_size(self.undo_stack.popleft())
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Recording
+    def record(self, canvas_data, cells):
+        # Called before the cells are changed. Only the first state of each cell is kept, so a whole stroke becomes one command
+        if self.before is None:
+            self.before = {}
+        before = self.before
+        for cell_pos in cells:
+            if cell_pos not in before:
+                before[cell_pos] = get_cell_state(canvas_data.get(cell_pos))
+
+    def end_command(self, canvas_data):
+        # Compare each recorded cell with its state now, and only keep the cells that have changed
+        if self.before is None:
+            return
+        before_records, after_records = bytearray(), bytearray()
+        for cell_pos, state in self.before.items():
+            after_state = get_cell_state(canvas_data.get(cell_pos))
+            if after_state != state:
+                before_records += CELL_STATE.pack(cell_pos[0], cell_pos[1], *state)
+                after_records += CELL_STATE.pack(cell_pos[0], cell_pos[1], *after_state)
+        self.before = None
+
+        if before_records:
+            # A new command means the commands that were undone can't be redone any more
+            self.memory_used -= sum(self.get_command_size(command) for command in self.redo_stack)
+            self.redo_stack = []
+
+            command = (bytes(before_records), bytes(after_records))
+            self.undo_stack.append(command)
+            self.memory_used += self.get_command_size(command)
+            self.evict()
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Undo / redo (Both return the records to apply to the canvas, or None if there is nothing to undo / redo)
+    def undo(self):
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        self.redo_stack.append(command)
+        return command[0]
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        self.undo_stack.append(command)
+        return command[1]
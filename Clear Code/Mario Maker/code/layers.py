@@ -0,0 +1,143 @@
+import pygame, random
+from settings import *
+from chunk_cache import ChunkCache
+
+class Sky:
+    """ The parts of the level that don't depend on the canvas: the sky, the clouds and the ocean
+    - The sky and ocean gradients are drawn once onto surfaces the size of the window, so drawing them is one blit each (plus a fill for any part of the window past the end of the surface)
+    - The clouds are drawn once onto a strip that is wider than the window. The strip scrolls by a fraction of the distance that the level is panned (parallax), and is blitted twice so that it repeats
+    - The horizon is at HORIZON_ROW, so the sky and the ocean move up and down with the level
+    """
+    def __init__(self, assets):
+        self.display_surface = pygame.display.get_surface()
+        self.sky_surface = self.create_sky()
+        self.ocean_surface = self.create_ocean()
+        self.cloud_surface = self.create_clouds(assets)
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Pre-baking
+    def draw_gradient(self, surface, top_colour, bottom_colour, top, height):
+        # One line for each row of the gradient
+        top_colour, bottom_colour = pygame.Color(top_colour), pygame.Color(bottom_colour)
+        for row in range(height):
+            pygame.draw.line(surface, top_colour.lerp(bottom_colour, row / max(1, height - 1)), (0, top + row), (surface.get_width(), top + row))
+
+    def create_sky(self):
+        # The sky colour at the top, fading into the horizon top colour just above the horizon (the bottom of the surface)
+        surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        surface.fill(SKY_COLOUR)
+        self.draw_gradient(surface, SKY_COLOUR, HORIZON_TOP_COLOUR, WINDOW_HEIGHT // 2, WINDOW_HEIGHT // 2 - 4)
+        self.draw_gradient(surface, HORIZON_TOP_COLOUR, HORIZON_COLOUR, WINDOW_HEIGHT - 4, 4)
+        return surface
+
+    def create_ocean(self):
+        # The horizon line at the top, fading into the sea colour below it
+        surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        surface.fill(SEA_COLOUR)
+        pygame.draw.line(surface, HORIZON_COLOUR, (0, 0), (WINDOW_WIDTH, 0), 3)
+        self.draw_gradient(surface, HORIZON_COLOUR, SEA_COLOUR, 3, 40)
+        return surface
+
+    def create_clouds(self, assets):
+        # The clouds are placed at random above the horizon (the same seed is used every time, so the clouds don't move between sessions)
+        cloud_images = [assets.get_image(f"graphics/clouds/Small Cloud {number}.png") for number in (1, 2, 3)]
+        surface = pygame.Surface((WINDOW_WIDTH * 2, CLOUD_HEIGHT), pygame.SRCALPHA)
+        cloud_random = random.Random(CLOUD_SEED)
+        for cloud_index in range(CLOUD_COUNT):
+            cloud = cloud_random.choice(cloud_images)
+            surface.blit(cloud, (cloud_random.randrange(surface.get_width() - cloud.get_width()), cloud_random.randrange(CLOUD_HEIGHT - cloud.get_height() - 20)))
+
+        # Run-length encode the surface, which makes blitting it much faster (most of the surface is completely transparent)
+        surface.set_alpha(255, pygame.RLEACCEL)
+        return surface
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Drawing
+    def draw_sky(self, horizon_y):
+        self.display_surface.blit(self.sky_surface, (0, horizon_y - WINDOW_HEIGHT))
+        if horizon_y > WINDOW_HEIGHT:
+            self.display_surface.fill(SKY_COLOUR, (0, 0, WINDOW_WIDTH, horizon_y - WINDOW_HEIGHT))
+
+    def draw_clouds(self, origin_x, horizon_y):
+        # The offset is wrapped around the width of the strip, so the strip is drawn at x and at x + its width
+        width = self.cloud_surface.get_width()
+        x = int(origin_x * CLOUD_PARALLAX) % width - width
+        for offset in (0, width):
+            self.display_surface.blit(self.cloud_surface, (x + offset, horizon_y - CLOUD_HEIGHT))
+
+    def draw_ocean(self, horizon_y):
+        self.display_surface.blit(self.ocean_surface, (0, horizon_y))
+        if horizon_y < 0:
+            self.display_surface.fill(SEA_COLOUR, (0, horizon_y + WINDOW_HEIGHT, WINDOW_WIDTH, -horizon_y))
+
+class LevelLayers:
+    """ Draws the level one layer at a time, in the order of LEVEL_LAYERS (clouds, ocean, bg, water, main), in front of the sky
+    - Each layer of tiles has its own chunk cache, so a layer is only rendered again when its own contents change (e.g. a change to the terrain masks only renders the main layer again)
+    - The chunk caches share one memory budget, so adding a layer doesn't add to the memory that the chunk surfaces can use
+    - The animations of each layer are drawn straight after the chunks of that layer, so they are behind the layers in front of them
+    - The sky, clouds and ocean are pre-baked (see Sky), so they never cost any per-tile work
+    """
+    def __init__(self, canvas_data, assets, tile_layers, get_frame_bounds, memory_budget = CHUNK_CACHE_BUDGET):
+        # Tile layers: layer name: (draw_tile, has_static_graphics, get_animated_ids) for each layer that has tiles on it (see ChunkCache)
+        self.canvas_data = canvas_data
+        self.sky = Sky(assets)
+        self.chunk_caches = {layer: ChunkCache(canvas_data, *functions, get_frame_bounds) for layer, functions in tile_layers.items()}
+        self.layers = sorted(LEVEL_LAYERS, key = LEVEL_LAYERS.get) # From the back to the front
+        self.tile_size = TILE_SIZE
+        self.memory_budget = memory_budget # In bytes, for the chunk surfaces of every layer together
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # SUPPORT
+    def mark_dirty(self, cell_pos, layer = None):
+        # The tile in this cell has changed (on one layer, or on every layer if no layer is given)
+        self.mark_chunks_dirty([self.canvas_data.get_chunk_pos(cell_pos)], layer)
+        if self.canvas_data.changed_cells is not None:
+            self.canvas_data.changed_cells.add(cell_pos)
+
+    def mark_chunks_dirty(self, chunk_positions, layer = None):
+        # The tiles in these chunks have changed, so the chunks need to be rendered again (and saved again, see level_file.py)
+        for chunk_cache in ([self.chunk_caches[layer]] if layer else self.chunk_caches.values()):
+            chunk_cache.mark_chunks_dirty(chunk_positions)
+        self.canvas_data.edited_chunks.update(chunk_positions)
+
+    def set_tile_size(self, tile_size):
+        self.tile_size = tile_size
+        for chunk_cache in self.chunk_caches.values():
+            chunk_cache.set_tile_size(tile_size)
+
+    def get_memory_used(self):
+        return sum(chunk_cache.memory_used for chunk_cache in self.chunk_caches.values())
+
+    def evict(self):
+        """ Remove the least recently used chunks from every layer until the chunk caches are within the memory budget
+        - Every layer draws the same chunks in each frame, so the chunks are in the same least recently used order in every cache, and a chunk is removed from all of the layers at once
+        - The chunks that are on the screen are never removed (at the largest zoom levels they can use more than the budget on their own)
+        """
+        memory_used = self.get_memory_used()
+        if memory_used <= self.memory_budget:
+            return
+        chunk_caches = list(self.chunk_caches.values())
+        visible_chunks = set().union(*(chunk_cache.visible_chunks for chunk_cache in chunk_caches))
+        for chunk_pos in list(chunk_caches[0].surfaces):
+            if memory_used <= self.memory_budget:
+                break
+            if chunk_pos not in visible_chunks:
+                for chunk_cache in chunk_caches:
+                    chunk_cache.remove(chunk_pos)
+                memory_used = self.get_memory_used()
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Drawing
+    def draw(self, display_surface, origin, topleft_cell, bottomright_cell, draw_animations):
+        # draw_animations(chunk_cache) draws the animations of a layer on top of its chunks
+        horizon_y = int(origin.y + HORIZON_ROW * self.tile_size)
+        self.sky.draw_sky(horizon_y)
+        for layer in self.layers:
+            if layer == "clouds":
+                self.sky.draw_clouds(origin.x, horizon_y)
+            elif layer == "ocean":
+                self.sky.draw_ocean(horizon_y)
+            elif layer in self.chunk_caches:
+                self.chunk_caches[layer].draw(display_surface, origin, topleft_cell, bottomright_cell)
+                draw_animations(self.chunk_caches[layer])
+        self.evict()
@@ -0,0 +1,145 @@
+import os, mmap, struct
+from settings import *
+
+""" Binary level files
+- The file starts with a header, then the tiles of each chunk (one fixed size record per cell), then the chunk index
+- The chunk index says where the records of each chunk are in the file, so the file can be memory-mapped and a chunk can be read without reading the rest of the level
+- Saving only writes the chunks that have been edited: their records and a new index are added to the end of the file, then the header is changed to point at the new index
+- The old records of the edited chunks are left in the file. Once they take up more space than the level itself, the whole file is written again without them (compacting)
+
+Header:       magic (4 bytes), version, chunk size, index offset, chunk count, unused bytes
+Index entry:  chunk column, chunk row, offset of the first record, cell count
+Cell record:  column and row inside of the chunk, flags (terrain, water, water on top), terrain mask, coin id, enemy id (0 = none)
+"""
+LEVEL_MAGIC = b"MMLV"
+LEVEL_VERSION = 1
+
+HEADER = struct.Struct("<4sHHQIQ")
+INDEX_ENTRY = struct.Struct("<iiQH")
+CELL_RECORD = struct.Struct("<BBBBBB")
+
+HAS_TERRAIN = 1
+HAS_WATER = 2
+WATER_ON_TOP = 4
+ERASED = 128 # A cell that has no tile (only used by the autosave journal and the undo history, the level file doesn't store empty cells)
+
+def encode_chunk(chunk_pos, chunk, chunk_size):
+    # The records of every tile in a chunk, as bytes
+    first_column, first_row = chunk_pos[0] * chunk_size, chunk_pos[1] * chunk_size
+    records = bytearray(len(chunk) * CELL_RECORD.size)
+    for index, (cell_pos, tile) in enumerate(chunk.items()):
+        flags = (HAS_TERRAIN if tile.has_terrain else 0) | (HAS_WATER if tile.has_water else 0) | (WATER_ON_TOP if tile.water_on_top else 0)
+        CELL_RECORD.pack_into(records, index * CELL_RECORD.size, cell_pos[0] - first_column, cell_pos[1] - first_row, flags, tile.terrain_mask, tile.coin or 0, tile.enemy or 0)
+    return records
+
+class LevelFile:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        self.read_index()
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Reading
+    def read_index(self):
+        magic, version, self.chunk_size, index_offset, chunk_count, self.unused_bytes = HEADER.unpack_from(self.map, 0)
+        if magic != LEVEL_MAGIC:
+            raise ValueError(f"{self.path} is not a level file")
+        if version != LEVEL_VERSION:
+            raise ValueError(f"{self.path} is level version {version}, expected version {LEVEL_VERSION}")
+
+        self.index = {} # Chunk pos: (offset of the first record, cell count)
+        for entry in range(chunk_count):
+            chunk_col, chunk_row, offset, cell_count = INDEX_ENTRY.unpack_from(self.map, index_offset + entry * INDEX_ENTRY.size)
+            self.index[(chunk_col, chunk_row)] = (offset, cell_count)
+        self.end_offset = index_offset + chunk_count * INDEX_ENTRY.size
+
+    def read_records(self, chunk_pos):
+        # The records of a chunk, as bytes
+        offset, cell_count = self.index[chunk_pos]
+        return self.map[offset:offset + cell_count * CELL_RECORD.size]
+
+    def read_chunk(self, chunk_pos):
+        # The cells of a chunk, as (cell pos, has_terrain, terrain_mask, has_water, water_on_top, coin, enemy)
+        first_column, first_row = chunk_pos[0] * self.chunk_size, chunk_pos[1] * self.chunk_size
+        for column, row, flags, terrain_mask, coin, enemy in CELL_RECORD.iter_unpack(self.read_records(chunk_pos)):
+            yield ((first_column + column, first_row + row), bool(flags & HAS_TERRAIN), terrain_mask, bool(flags & HAS_WATER), bool(flags & WATER_ON_TOP), coin or None, enemy or None)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Writing
+    def save(self, canvas_data, edited_chunks):
+        # Add the edited chunks and a new index to the end of the file (the chunks that haven't changed stay where they are)
+        if not edited_chunks:
+            return self
+        new_index = dict(self.index)
+        data = bytearray()
+        unused_bytes = self.unused_bytes + len(self.index) * INDEX_ENTRY.size # The old index will no longer be used
+        for chunk_pos in edited_chunks:
+            if chunk_pos in self.index:
+                unused_bytes += self.index[chunk_pos][1] * CELL_RECORD.size
+            chunk = canvas_data.chunks.get(chunk_pos)
+            if chunk:
+                new_index[chunk_pos] = (self.end_offset + len(data), len(chunk))
+                data += encode_chunk(chunk_pos, chunk, self.chunk_size)
+            else:
+                new_index.pop(chunk_pos, None) # All of the tiles in this chunk were erased
+
+        # Too much of the file is unused, so write the whole level again
+        used_bytes = HEADER.size + sum(cell_count for offset, cell_count in new_index.values()) * CELL_RECORD.size + len(new_index) * INDEX_ENTRY.size
+        if unused_bytes > used_bytes:
+            return self.compact(canvas_data, edited_chunks)
+
+        index_offset = self.end_offset + len(data)
+        for (chunk_col, chunk_row), (offset, cell_count) in new_index.items():
+            data += INDEX_ENTRY.pack(chunk_col, chunk_row, offset, cell_count)
+
+        # The new data is written before the header, so if the editor crashes while saving, the file still has the last save
+        self.file.seek(self.end_offset)
+        self.file.write(data)
+        self.file.flush()
+        self.file.seek(0)
+        self.file.write(HEADER.pack(LEVEL_MAGIC, LEVEL_VERSION, self.chunk_size, index_offset, len(new_index), unused_bytes))
+        self.file.flush()
+
+        # Map the file again, as it has grown
+        self.map.close()
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        self.read_index()
+        return self
+
+    def compact(self, canvas_data, edited_chunks):
+        # Write every chunk into a new file (the chunks that haven't changed are copied as bytes, without reading their tiles)
+        chunks = {chunk_pos: self.read_records(chunk_pos) for chunk_pos in self.index if chunk_pos not in edited_chunks}
+        chunks.update(encode_chunks(canvas_data, edited_chunks))
+        self.close()
+        return write_level(self.path, self.chunk_size, chunks)
+
+def encode_chunks(canvas_data, chunk_positions = None):
+    # The records of each chunk in the canvas (only the chunks in chunk_positions if it is given), as chunk pos: bytes
+    chunk_positions = canvas_data.chunks if chunk_positions is None else chunk_positions
+    return {chunk_pos: encode_chunk(chunk_pos, canvas_data.chunks[chunk_pos], canvas_data.chunk_size) for chunk_pos in chunk_positions if canvas_data.chunks.get(chunk_pos)}
+
+def write_level(path, chunk_size, chunks):
+    # Write a new level file from the records of each chunk (chunk pos: bytes) and open it
+    index = {}
+    data = bytearray(HEADER.size)
+    for chunk_pos, records in chunks.items():
+        index[chunk_pos] = (len(data), len(records) // CELL_RECORD.size)
+        data += records
+
+    index_offset = len(data)
+    for (chunk_col, chunk_row), (offset, cell_count) in index.items():
+        data += INDEX_ENTRY.pack(chunk_col, chunk_row, offset, cell_count)
+    HEADER.pack_into(data, 0, LEVEL_MAGIC, LEVEL_VERSION, chunk_size, index_offset, len(index), 0)
+
+    # Write to a temporary file first, so that the old level is kept if the editor crashes while saving
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path + ".tmp", "wb") as level_file:
+        level_file.write(data)
+    os.replace(path + ".tmp", path)
+    return LevelFile(path)
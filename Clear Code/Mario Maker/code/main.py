@@ -1,11 +1,16 @@
-import pygame, sys 
+import pygame, sys, time, argparse
 from settings import *
 from editor import Editor
 from pygame.image import load
 from support import *
+from atlas import load_atlas
+from assets import AssetManager
+from profiler import FrameProfiler
+from replay import InputRecorder
+from autosave import Autosave
 
 class Main:
-    def __init__(self):
+    def __init__(self, record_path = None, level_path = None, autosave_path = None):
         # Pygame set-up
         pygame.init()
         self.display_surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
@@ -13,32 +18,99 @@ class Main:
         self.imports()
 
         # Editor
-        self.editor = Editor(self.land_tiles) # Pass in the land tiles so that the images can be operated on inside the editor file
+        self.editor = Editor(self.land_tiles, self.assets, level_path) # Pass in the land tiles so that the images can be operated on inside the editor file
+
+        # Autosave (The changed cells are written to a journal by another thread, so the frame loop never waits for the disk)
+        if autosave_path:
+            self.editor.autosave = Autosave(self.editor.canvas_data, autosave_path, level_path)
+
+        # Profiler (F3 shows the overlay with the time of each phase of the frame, F4 exports the times)
+        self.profiler = FrameProfiler(
+            targets = [
+                ("event_loop", self.editor, "event_loop"),
+                ("canvas_add", self.editor, "canvas_add"), # Called inside of event_loop
+                ("draw_level", self.editor, "draw_level"),
+                ("draw_tile_lines", self.editor, "draw_tile_lines"),
+                ("menu.display", self.editor.menu, "display"),
+            ],
+            extra_phases = ["editor.run", "display.update"])
+
+        # Input recording (The recording can be replayed with replay.py, to check that another version of the editor creates the same level)
+        self.recorder = InputRecorder(record_path, level_path) if record_path else None
 
         # Cursor
         cursor_image = load("graphics/cursors/mouse.png").convert_alpha()
 
         # Creating a cursor object
         cursor = pygame.cursors.Cursor((0,0), cursor_image) # (0,0) is the part of the image which will be where the click is initiated from
-        pygame.mouse.set_cursor(cursor)
+        try:
+            pygame.mouse.set_cursor(cursor)
+        except pygame.error:
+            pass # Cursors aren't supported without a real display (e.g. when running the benchmarks), so keep the default cursor
         
     # Importing data (this is in main because there are alot of files which the level and editor will both need later on)
     def imports(self):
-        self.land_tiles = import_folder_dict("graphics/terrain/land")
+        # The land tiles are packed into one atlas, each tile is a subsurface of the atlas page (This works the same as import_folder_dict("graphics/terrain/land"))
+        self.land_atlas = load_atlas("land")
+        self.land_tiles = self.land_atlas.get_surfaces()
+        # The animations of the canvas and the menu images are packed into atlases as well (anything else is loaded when it is first used)
+        self.assets = AssetManager(atlases = [load_atlas("animations"), load_atlas("menu")])
+
+
+    def profiler_input(self, events):
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.profiler.toggle()
+                self.editor.redraw_all = True # Draw the whole window again, so that the overlay is removed when it is hidden
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                self.profiler.export()
 
+    def run_profiled(self, dt, events):
+        # The same as a normal frame, but each part is timed and the overlay is drawn on top
+        frame_start = time.perf_counter()
+        dirty_rects = self.editor.run(dt, events)
+        self.profiler.add("editor.run", time.perf_counter() - frame_start)
+
+        self.profiler.draw(self.display_surface)
+        update_start = time.perf_counter()
+        pygame.display.update(dirty_rects + [self.profiler.overlay_rect])
+        self.profiler.add("display.update", time.perf_counter() - update_start)
+
+        self.profiler.end_frame(time.perf_counter() - frame_start)
 
     def run(self):
         while True:
             # Delta time, used to keep our framerate independent
             dt = self.clock.tick() / 1000 
 
-            self.editor.run(dt)
-            
-            pygame.display.update()
+            events = pygame.event.get()
+            # If nothing is happening, wait for the next event instead of drawing the same frame again (This uses almost no CPU, and the editor wakes up as soon as there is input)
+            # When something on the screen is animated, only wait until the next frame of the animations
+            if DIRTY_RECT_RENDERING and not events and self.editor.is_idle():
+                wait_time = self.editor.get_wait_time()
+                event = pygame.event.wait() if wait_time is None else pygame.event.wait(wait_time)
+                events = ([event] if event.type != pygame.NOEVENT else []) + pygame.event.get()
+            self.profiler_input(events)
+            if self.recorder:
+                self.recorder.record(dt, events)
+
+            if self.profiler.enabled:
+                self.run_profiled(dt, events)
+            else:
+                # Only update the areas of the window that have changed
+                dirty_rects = self.editor.run(dt, events)
+                if dirty_rects:
+                    pygame.display.update(dirty_rects)
 
 # If we are in the main file
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", help = "Record the input of this session to a file (see replay.py)")
+    parser.add_argument("--level", default = LEVEL_PATH, help = "The level file to open and save to (see level_file.py)")
+    parser.add_argument("--no-autosave", action = "store_true", help = "Turn off autosave (see autosave.py)")
+    args = parser.parse_args()
+
     # Create an instance of the Main class
-    main = Main()
+    main = Main(record_path = args.record, level_path = args.level, autosave_path = None if args.no_autosave else AUTOSAVE_PATH)
     # Call the run method
     main.run()
\ No newline at end of file
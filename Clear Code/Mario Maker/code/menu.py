@@ -1,26 +1,35 @@
 import pygame
 from settings import *
-from pygame.image import load
 
 class Menu:
-    def __init__(self):
+    """ The buttons in the bottom-right corner of the window
+    - The buttons and the highlight are drawn onto one surface, which is only drawn again after a click or when the selection index changes
+    - Every other frame, the menu is drawn with one blit of that surface
+    """
+    def __init__(self, assets):
         self.display_surface = pygame.display.get_surface()
+        self.assets = assets # The menu surfaces are loaded by the asset manager the first time that they are shown
         self.create_data() # Import data of tiles, needs to be before the buttons, because we need the data to make the buttons properly
         self.create_buttons() # Call the method to create buttons
 
-    # Importing items
+        # The whole menu, including the highlight around the buttons (the space between the buttons is transparent)
+        self.surface_rect = self.rect.inflate(10, 10)
+        self.surface = pygame.Surface(self.surface_rect.size, pygame.SRCALPHA)
+        self.drawn_index = None # The selection index that the menu surface was drawn for (None when it needs to be drawn again)
+
+    # Grouping the items (only the ids are stored here, the surfaces are loaded when a button first shows them)
     def create_data(self):
-        self.menu_surfaces = {}
+        self.menu_items = {}
         # Iterate through each key:value pair in the editor data dictionary
         for key, value in EDITOR_DATA.items():
             # If the value inside of the value "menu" has a value i.e not "None"
             if value["menu"]:
-                # If this value isn't already in the self.menu_surfaces dictionary
-                if not value["menu"] in self.menu_surfaces:
-                    self.menu_surfaces[value["menu"]] = [(key, load(value["menu_surf"]))]
-                # In case that they both have "terrain" for example as the value["menu"], the "water" surface would be ignored without this second condition
+                # If this value isn't already in the self.menu_items dictionary
+                if not value["menu"] in self.menu_items:
+                    self.menu_items[value["menu"]] = [key]
+                # In case that they both have "terrain" for example as the value["menu"], the "water" item would be ignored without this second condition
                 else:
-                    self.menu_surfaces[value["menu"]].append((key, load(value["menu_surf"])))
+                    self.menu_items[value["menu"]].append(key)
 
     # Change self.index to change items
     def click(self, mouse_pos, mouse_button):
@@ -28,9 +37,10 @@ class Menu:
             if sprite.rect.collidepoint(mouse_pos):
                 # Check for different mouse clicks
                 if mouse_button[1]: # Middle mouse click
-                    sprite.main_active = not sprite.main_active if sprite.items["alt"] else True # Turn main_active on/off only if the button has alternative items
+                    sprite.toggle()
                 if mouse_button[2]: # Right click
                     sprite.switch()
+                self.drawn_index = None # The button may show a different item now
 
                 return sprite.get_id()
 
@@ -52,21 +62,28 @@ class Menu:
 
         # Create the buttons
         self.buttons = pygame.sprite.Group()
-        Button(rect = self.tile_button_rect, group = self.buttons, items = self.menu_surfaces["terrain"]) # First button
-        Button(rect = self.coin_button_rect, group = self.buttons, items = self.menu_surfaces["coin"])
-        Button(rect = self.enemy_button_rect, group = self.buttons, items = self.menu_surfaces["enemy"])
-        Button(rect = self.palm_button_rect, group = self.buttons, items = self.menu_surfaces["palm fg"],items_alt = self.menu_surfaces["palm bg"])
+        Button(rect = self.tile_button_rect, group = self.buttons, assets = self.assets, items = self.menu_items["terrain"]) # First button
+        Button(rect = self.coin_button_rect, group = self.buttons, assets = self.assets, items = self.menu_items["coin"])
+        Button(rect = self.enemy_button_rect, group = self.buttons, assets = self.assets, items = self.menu_items["enemy"])
+        Button(rect = self.palm_button_rect, group = self.buttons, assets = self.assets, items = self.menu_items["palm fg"],items_alt = self.menu_items["palm bg"])
+
+        # The button to highlight for each menu (so finding it is one lookup)
+        self.highlight_rects = {"terrain": self.tile_button_rect, "coin": self.coin_button_rect, "enemy": self.enemy_button_rect, "palm fg": self.palm_button_rect, "palm bg": self.palm_button_rect}
 
     # Highlights the currently selected button
     def highlight_indicator(self, index):
-        if EDITOR_DATA[index]["menu"] == "terrain":
-            pygame.draw.rect(self.display_surface, BUTTON_LINE_COLOUR, self.tile_button_rect.inflate(4, 4), 5, 4) # Last parameter is border rounding
-        if EDITOR_DATA[index]["menu"] == "coin":
-            pygame.draw.rect(self.display_surface, BUTTON_LINE_COLOUR, self.coin_button_rect.inflate(4, 4), 5, 4) # Last parameter is border rounding
-        if EDITOR_DATA[index]["menu"] == "enemy":
-            pygame.draw.rect(self.display_surface, BUTTON_LINE_COLOUR, self.enemy_button_rect.inflate(4, 4), 5, 4) # Last parameter is border rounding
-        if EDITOR_DATA[index]["menu"] in ("palm bg", "palm fg"): # Check if the value selected is either in palm bg or palm fg
-            pygame.draw.rect(self.display_surface, BUTTON_LINE_COLOUR, self.palm_button_rect.inflate(4, 4), 5, 4) # Last parameter is border rounding      
+        rect = self.highlight_rects.get(EDITOR_DATA[index]["menu"])
+        if rect:
+            # Drawn onto the menu surface, so the rect is moved to be relative to the menu surface
+            pygame.draw.rect(self.surface, BUTTON_LINE_COLOUR, rect.move(-self.surface_rect.x, -self.surface_rect.y).inflate(4, 4), 5, 4) # Last parameter is border rounding
+
+    def draw_surface(self, index):
+        # Draw the buttons and the highlight onto the menu surface
+        self.surface.fill((0, 0, 0, 0))
+        for sprite in self.buttons:
+            self.surface.blit(sprite.image, (sprite.rect.x - self.surface_rect.x, sprite.rect.y - self.surface_rect.y))
+        self.highlight_indicator(index)
+        self.drawn_index = index
 
     def display(self, index):
         # pygame.draw.rect(self.display_surface, "red", self.rect)
@@ -75,26 +92,29 @@ class Menu:
         # pygame.draw.rect(self.display_surface, "yellow", self.enemy_button_rect)
         # pygame.draw.rect(self.display_surface, "brown", self.palm_button_rect)
 
-        self.buttons.update()
-        self.buttons.draw(self.display_surface)
-        self.highlight_indicator(index)
+        # Only draw the menu surface again if something on it has changed
+        if index != self.drawn_index:
+            self.draw_surface(index)
+        self.display_surface.blit(self.surface, self.surface_rect)
         
 
 class Button(pygame.sprite.Sprite): 
     # Items = foreground palm trees items_alt = background palm trees
-    def __init__(self, rect, group, items, items_alt = None): # group = the group that this button sprite is part off
+    def __init__(self, rect, group, assets, items, items_alt = None): # group = the group that this button sprite is part off
         super().__init__(group) 
         self.image = pygame.Surface(rect.size) # Will be a plain surface with the size of the button rectangle(created above)
         self.rect = rect
+        self.assets = assets
 
         # Items
         self.items = {"main": items, "alt": items_alt}
         self.index = 0 # Determines the item we are looking at
         self.main_active = True # Determines whether we are looking at the main items or alternative items
+        self.update() # The image is only drawn again when the item changes (see switch and toggle)
 
     # Get the id (the self.index)
     def get_id(self):
-        return self.items["main" if self.main_active else "alt"][self.index][0] # If self.main is active, we return items or items_alt
+        return self.items["main" if self.main_active else "alt"][self.index] # If self.main is active, we return items or items_alt
     
     # Switch index 
     def switch(self):
@@ -104,12 +124,18 @@ class Button(pygame.sprite.Sprite):
         This means that if terrain had 3 items. After the 3rd item, it will loop back to the 1st item
         """
         self.index = 0 if self.index >= len(self.items["main" if self.main_active else "alt"]) else self.index 
+        self.update()
+
+    # Switch between the main and alternative items
+    def toggle(self):
+        self.main_active = not self.main_active if self.items["alt"] else True # Turn main_active on/off only if the button has alternative items
+        self.update()
 
-    # Display what we have inside of the sprite
+    # Draw the item that the button is showing onto the image of the sprite
     def update(self):
         # Fill the background of the button with this colour
         self.image.fill(BUTTON_BG_COLOUR)
-        surface = self.items["main" if self.main_active else "alt"][self.index][1] # The graphic of the surface tuple
+        surface = self.assets.get_menu_surf(self.get_id()) # The graphic of the item (loaded the first time it is shown)
         #print(surface)
         rect = surface.get_rect(center = (self.rect.width / 2, self.rect.height / 2))
         # Draw the image icon onto the button box
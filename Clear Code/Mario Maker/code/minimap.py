@@ -0,0 +1,127 @@
+import pygame
+from settings import *
+
+class Minimap:
+    """ A small map of the whole level, with a rectangle around the part of the level that is on the screen
+    - Each cell is one pixel of the cell surface. Only the pixels of the cells that change are drawn again (the minimap is never rebuilt from the whole canvas)
+    - The cell surface grows when a cell is added outside of it. The old pixels are copied across, so growing doesn't need the canvas either
+    - The cell surface is scaled to fit the panel (so each cell is a small block on small levels), but only after it has changed
+    """
+    def __init__(self, canvas_data):
+        self.display_surface = pygame.display.get_surface()
+        self.canvas_data = canvas_data
+
+        # Panel (top-right corner of the window)
+        self.rect = pygame.Rect(WINDOW_WIDTH - MINIMAP_SIZE[0] - 6, 6, *MINIMAP_SIZE)
+
+        # One pixel for each cell inside of the bounds (left cell, top cell, width, height)
+        self.bounds = None
+        self.cell_surface = None
+
+        # Cell surface scaled to fit the panel
+        self.scaled_surface = None
+        self.scaled_pos = (0, 0) # Where the scaled surface is drawn inside of the panel
+        self.scale = 1 # Size of a cell on the panel (in pixels)
+        self.changed = False # Set when the cell surface needs to be scaled again
+
+        # The colours are converted once, instead of every time a pixel is set
+        self.colours = {style: pygame.Color(colour) for style, colour in
+                        (("empty", MINIMAP_BG_COLOUR), ("terrain", MINIMAP_TERRAIN_COLOUR), ("water", SEA_COLOUR), ("coin", MINIMAP_COIN_COLOUR), ("enemy", MINIMAP_ENEMY_COLOUR))}
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # SUPPORT
+    def get_colour(self, tile):
+        # Enemies and coins are shown over water and terrain
+        if tile is None:
+            return self.colours["empty"]
+        if tile.enemy:
+            return self.colours["enemy"]
+        if tile.coin:
+            return self.colours["coin"]
+        if tile.has_water:
+            return self.colours["water"]
+        return self.colours["terrain"]
+
+    def grow(self, left, top, right, bottom):
+        # Make the cell surface large enough for the area of cells (with room to spare, so that it doesn't grow every time a cell is added)
+        if self.bounds:
+            old_left, old_top, old_width, old_height = self.bounds
+            if old_left <= left and old_top <= top and right < old_left + old_width and bottom < old_top + old_height:
+                return
+            margin = max(old_width, old_height) // 2
+            left, top = min(left, old_left) - margin, min(top, old_top) - margin
+            right, bottom = max(right, old_left + old_width - 1) + margin, max(bottom, old_top + old_height - 1) + margin
+        else:
+            margin = CHUNK_SIZE
+            left, top, right, bottom = left - margin, top - margin, right + margin, bottom + margin
+
+        cell_surface = pygame.Surface((right - left + 1, bottom - top + 1))
+        cell_surface.fill(MINIMAP_BG_COLOUR)
+        if self.bounds:
+            cell_surface.blit(self.cell_surface, (old_left - left, old_top - top))
+        self.bounds = (left, top, right - left + 1, bottom - top + 1)
+        self.cell_surface = cell_surface
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Updating
+    def update_cells(self, cells):
+        # Draw the pixels of cells that have changed
+        if not cells:
+            return
+        self.grow(min(cell_pos[0] for cell_pos in cells), min(cell_pos[1] for cell_pos in cells), max(cell_pos[0] for cell_pos in cells), max(cell_pos[1] for cell_pos in cells))
+
+        left, top = self.bounds[0], self.bounds[1]
+        chunks, chunk_size = self.canvas_data.chunks, self.canvas_data.chunk_size
+        set_at = self.cell_surface.set_at
+        self.cell_surface.lock() # Locking the surface once makes setting many pixels faster
+        for cell_pos in cells:
+            # The same as self.canvas_data.get(cell_pos), without the extra function calls
+            chunk = chunks.get((cell_pos[0] // chunk_size, cell_pos[1] // chunk_size))
+            set_at((cell_pos[0] - left, cell_pos[1] - top), self.get_colour(chunk.get(cell_pos) if chunk else None))
+        self.cell_surface.unlock()
+        self.changed = True
+
+    def add_chunk_outline(self, chunk_pos):
+        # A chunk that is in the level file but hasn't been read yet (it is shown as one block until it is read)
+        chunk_size = self.canvas_data.chunk_size
+        left, top = chunk_pos[0] * chunk_size, chunk_pos[1] * chunk_size
+        self.grow(left, top, left + chunk_size - 1, top + chunk_size - 1)
+        self.cell_surface.fill(MINIMAP_UNLOADED_COLOUR, (left - self.bounds[0], top - self.bounds[1], chunk_size, chunk_size))
+        self.changed = True
+
+    def update_scaled_surface(self):
+        # The largest scale that fits the whole cell surface inside of the panel (whole pixels per cell when it is scaled up, so that every cell is the same size)
+        width, height = self.bounds[2], self.bounds[3]
+        self.scale = min(self.rect.width / width, self.rect.height / height)
+        if self.scale >= 1:
+            self.scale = int(self.scale)
+        size = (max(1, int(width * self.scale)), max(1, int(height * self.scale)))
+        self.scaled_surface = pygame.transform.scale(self.cell_surface, size)
+        self.scaled_pos = (self.rect.x + (self.rect.width - size[0]) // 2, self.rect.y + (self.rect.height - size[1]) // 2)
+        self.changed = False
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Input
+    def get_cell(self, pos):
+        # The cell of the level at a position on the panel
+        return (self.bounds[0] + int((pos[0] - self.scaled_pos[0]) / self.scale), self.bounds[1] + int((pos[1] - self.scaled_pos[1]) / self.scale))
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Drawing
+    def draw(self, topleft_cell, bottomright_cell):
+        pygame.draw.rect(self.display_surface, BUTTON_BG_COLOUR, self.rect.inflate(4, 4))
+        pygame.draw.rect(self.display_surface, MINIMAP_BG_COLOUR, self.rect)
+        if not self.bounds:
+            return
+        if self.changed:
+            self.update_scaled_surface()
+        self.display_surface.blit(self.scaled_surface, self.scaled_pos)
+
+        # The part of the level on the screen
+        viewport = pygame.Rect(
+            self.scaled_pos[0] + (topleft_cell[0] - self.bounds[0]) * self.scale,
+            self.scaled_pos[1] + (topleft_cell[1] - self.bounds[1]) * self.scale,
+            max(2, (bottomright_cell[0] - topleft_cell[0] + 1) * self.scale),
+            max(2, (bottomright_cell[1] - topleft_cell[1] + 1) * self.scale)).clip(self.rect)
+        if viewport.width and viewport.height:
+            pygame.draw.rect(self.display_surface, MINIMAP_VIEWPORT_COLOUR, viewport, 1)
@@ -0,0 +1,105 @@
+import pygame, time, json, csv
+from settings import *
+
+class FrameProfiler:
+    """ Times each phase of a frame (e.g. draw_level, event_loop) and keeps the last PROFILER_FRAMES frames in a ring buffer
+    - The methods are only replaced with timed versions while the profiler is enabled. When it is disabled the original methods are used, so there is no extra cost
+    - F3 shows/hides the overlay (which enables/disables the profiler), F4 exports the recorded frames as JSON and CSV
+    """
+    def __init__(self, targets, extra_phases = (), size = PROFILER_FRAMES):
+        self.targets = targets # List of (phase name, object, method name)
+        self.size = size
+        self.enabled = False
+
+        # Ring buffer (one list for each phase, plus the total frame time). The oldest frame is overwritten once the buffer is full
+        self.phase_names = ["frame"] + list(extra_phases) + [phase for phase, obj, method_name in self.targets] # Extra phases are timed by the caller with self.add
+        self.frames = {phase: [0.0] * self.size for phase in self.phase_names}
+        self.frame_index = 0 # Where the next frame will be written
+        self.frame_count = 0 # How many frames have been recorded (up to the size of the buffer)
+        self.current = {} # Phase name: time spent in the current frame
+
+        # Overlay
+        self.font = None # Created the first time the overlay is drawn
+        self.overlay_rect = pygame.Rect(10, 10, 340, 80 + 18 * len(self.phase_names))
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Timing
+    def add(self, phase, seconds):
+        self.current[phase] = self.current.get(phase, 0) + seconds
+
+    def create_timed_method(self, phase, method):
+        def timed_method(*args, **kwargs):
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            self.add(phase, time.perf_counter() - start)
+            return result
+        return timed_method
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        for phase, obj, method_name in self.targets:
+            if self.enabled:
+                # Setting the method on the object hides the method of the class, so the timed version is called instead
+                setattr(obj, method_name, self.create_timed_method(phase, getattr(obj, method_name)))
+            else:
+                # Removing it from the object means the method of the class is used again
+                delattr(obj, method_name)
+        self.current = {}
+
+    def end_frame(self, frame_time):
+        # Write the times of this frame into the ring buffer
+        self.current["frame"] = frame_time
+        for phase in self.phase_names:
+            self.frames[phase][self.frame_index] = self.current.get(phase, 0)
+        self.frame_index = (self.frame_index + 1) % self.size
+        self.frame_count = min(self.frame_count + 1, self.size)
+        self.current = {}
+
+    def get_frames(self, phase):
+        # The recorded times of a phase, from oldest to newest
+        if self.frame_count < self.size:
+            return self.frames[phase][:self.frame_count]
+        return self.frames[phase][self.frame_index:] + self.frames[phase][:self.frame_index]
+
+    def get_stats(self, phase):
+        # Rolling average and 99th percentile (in milliseconds)
+        frames = sorted(self.get_frames(phase))
+        if not frames:
+            return 0, 0
+        return sum(frames) / len(frames) * 1000, frames[min(len(frames) - 1, int(len(frames) * 0.99))] * 1000
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Exporting
+    def export(self, path = PROFILER_EXPORT_PATH):
+        # The times of every recorded frame (in milliseconds), saved as path.json and path.csv
+        frames = {phase: [seconds * 1000 for seconds in self.get_frames(phase)] for phase in self.phase_names}
+        with open(path + ".json", "w") as json_file:
+            json.dump(frames, json_file)
+        with open(path + ".csv", "w", newline = "") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(self.phase_names)
+            writer.writerows(zip(*(frames[phase] for phase in self.phase_names)))
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Overlay
+    def draw(self, surface):
+        if not self.font:
+            self.font = pygame.font.Font(None, 20)
+
+        pygame.draw.rect(surface, BUTTON_BG_COLOUR, self.overlay_rect)
+
+        # Rolling average and p99 of each phase
+        y = self.overlay_rect.top + 6
+        for phase in self.phase_names:
+            average, p99 = self.get_stats(phase)
+            text = self.font.render(f"{phase}: avg {average:.2f} ms  p99 {p99:.2f} ms", True, BUTTON_LINE_COLOUR)
+            surface.blit(text, (self.overlay_rect.left + 6, y))
+            y += 18
+
+        # Frame time graph (one bar per frame, the line is at 16.7 ms = 60 fps)
+        graph_rect = pygame.Rect(self.overlay_rect.left + 6, y + 4, self.overlay_rect.width - 12, self.overlay_rect.bottom - y - 10)
+        frame_times = self.get_frames("frame")[-graph_rect.width // 2:]
+        for index, frame_time in enumerate(frame_times):
+            bar_height = min(graph_rect.height, frame_time * 1000 / 33.3 * graph_rect.height)
+            pygame.draw.line(surface, "orange", (graph_rect.left + index * 2, graph_rect.bottom), (graph_rect.left + index * 2, graph_rect.bottom - bar_height))
+        pygame.draw.line(surface, "red", (graph_rect.left, graph_rect.bottom - graph_rect.height / 2), (graph_rect.right, graph_rect.bottom - graph_rect.height / 2))
@@ -0,0 +1,120 @@
+import pygame, json, hashlib, time, os, shutil, tempfile
+
+""" Recording and replaying editing sessions
+- While recording, every frame's events and the mouse/keyboard state that the editor polls are saved (one JSON line per frame)
+- A replay feeds the same input back into the editor, as fast as possible and without a window, then prints a checksum of the canvas and the frame times
+- Two builds that give the same checksum for the same recording made the same level, so changes to the editor can be checked and timed
+- The level that was open when recording started is copied next to the recording. A replay opens a copy of it in a temporary folder, so the replay starts from the same level and saving (CTRL + S) never writes over a real level
+- Record: python code/main.py --record session.jsonl
+- Replay: python code/replay.py session.jsonl (from the Mario Maker folder)
+"""
+RECORDING_VERSION = 2 # Version 2 saves the held keys as key codes (pygame.K_...), version 1 saved scancodes
+
+def serialise_event(event):
+    # Only keep the values that can be saved as JSON (tuples are saved as lists)
+    values = {key: list(value) if isinstance(value, tuple) else value for key, value in event.dict.items()
+              if isinstance(value, (int, float, str, bool, tuple)) or value is None}
+    return {"type": event.type, "values": values}
+
+def deserialise_event(data):
+    values = {key: tuple(value) if isinstance(value, list) else value for key, value in data["values"].items()}
+    return pygame.event.Event(data["type"], **values)
+
+def get_canvas_checksum(canvas_data):
+    # Hash every tile in cell order, so that the same level always gives the same checksum (no matter what order the tiles were added in)
+    checksum = hashlib.sha256()
+    for cell_pos, tile in sorted(canvas_data.items()):
+        checksum.update(repr((cell_pos, tile.has_terrain, tile.terrain_mask, tile.has_water, tile.water_on_top, tile.coin, tile.enemy)).encode())
+    return checksum.hexdigest()
+
+def get_level_copy_path(recording_path):
+    # Where the level that was open when recording started is kept (e.g. session.jsonl -> session.level.mml)
+    return os.path.splitext(recording_path)[0] + ".level.mml"
+
+def open_recorded_level(recording_path, header):
+    # A copy of the recorded level in a temporary folder (an empty level if no level file was open), which the editor opens and saves to during the replay
+    level_path = os.path.join(tempfile.mkdtemp(), "replay.mml")
+    if header.get("level"):
+        shutil.copyfile(os.path.join(os.path.dirname(recording_path), header["level"]), level_path)
+    return level_path
+
+class InputRecorder:
+    def __init__(self, path, level_path = None):
+        self.frame_index = 0
+        self.held_keys = set() # The editor checks keys with key codes (e.g. keys[pygame.K_LCTRL]), so the held keys are followed with the key events rather than pygame.key.get_pressed() (which is indexed by scancode)
+        self.file = open(path, "w")
+
+        # Keep the level as it was before any input, so the replay can start from it (saving during the session writes over the original)
+        header = {"version": RECORDING_VERSION, "level": None}
+        if level_path and os.path.exists(level_path):
+            shutil.copyfile(level_path, get_level_copy_path(path))
+            header["level"] = os.path.basename(get_level_copy_path(path))
+        self.file.write(json.dumps(header) + "\n")
+
+    def record(self, dt, events):
+        # Each frame is written straight away, so the recording is kept even if the editor crashes
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                self.held_keys.add(event.key)
+            elif event.type == pygame.KEYUP:
+                self.held_keys.discard(event.key)
+            elif event.type == pygame.WINDOWFOCUSLOST:
+                self.held_keys.clear() # SDL releases every key when the window loses focus, without sending the key up events
+        frame = {
+            "frame": self.frame_index,
+            "dt": dt,
+            "events": [serialise_event(event) for event in events if event.type != pygame.QUIT], # Quitting isn't replayed
+            "mouse_pos": list(pygame.mouse.get_pos()),
+            "mouse_buttons": list(pygame.mouse.get_pressed()),
+            "held_keys": sorted(self.held_keys),
+        }
+        self.file.write(json.dumps(frame) + "\n")
+        self.file.flush()
+        self.frame_index += 1
+
+def load_recording(path):
+    # The header and the frames of a recording
+    with open(path) as recording_file:
+        header = json.loads(recording_file.readline())
+        if header.get("version") != RECORDING_VERSION:
+            raise ValueError(f"{path} is recording version {header.get('version')}, expected version {RECORDING_VERSION}")
+        return header, [json.loads(line) for line in recording_file if line.strip()]
+
+def replay(main, script, frames):
+    # Feed each recorded frame into the editor and time it
+    frame_times = []
+    for frame in frames:
+        script.pos = tuple(frame["mouse_pos"])
+        script.buttons = list(frame["mouse_buttons"])
+        script.held_keys = set(frame["held_keys"])
+        events = [deserialise_event(event) for event in frame["events"]]
+
+        start = time.perf_counter()
+        dirty_rects = main.editor.run(frame["dt"], events)
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+        frame_times.append(time.perf_counter() - start)
+
+    return frame_times
+
+if __name__ == "__main__":
+    import argparse
+    from headless import ScriptedInput # Sets up the dummy video driver, so the replay runs without a window
+    from main import Main
+
+    parser = argparse.ArgumentParser(description = "Replay a recorded editing session without a window")
+    parser.add_argument("recording", help = "A recording made with python code/main.py --record")
+    args = parser.parse_args()
+
+    header, frames = load_recording(args.recording)
+    main = Main(level_path = open_recorded_level(args.recording, header))
+    script = ScriptedInput()
+    frame_times = replay(main, script, frames)
+
+    frame_times.sort()
+    total = sum(frame_times)
+    print(f"checksum: {get_canvas_checksum(main.editor.canvas_data)}")
+    print(f"tiles: {len(main.editor.canvas_data)}")
+    print(f"frames: {len(frame_times)}, total {total * 1000:.1f} ms, mean {total / max(1, len(frame_times)) * 1000:.3f} ms, "
+          f"p50 {frame_times[len(frame_times) // 2] * 1000 if frame_times else 0:.3f} ms, "
+          f"p99 {frame_times[min(len(frame_times) - 1, int(len(frame_times) * 0.99))] * 1000 if frame_times else 0:.3f} ms")
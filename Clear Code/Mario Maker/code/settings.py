@@ -3,6 +3,32 @@ TILE_SIZE = 64
 WINDOW_WIDTH = 1280
 WINDOW_HEIGHT = 720
 ANIMATION_SPEED = 8
+ASSET_CACHE_PATH = "cache/assets" # Where the decoded pixels of the imported images are saved (so that the next start-up is faster)
+ATLAS_PATH = "cache/atlas" # Where the packed texture atlases are saved
+ATLAS_PAGE_SIZE = 2048 # The largest width and height of an atlas page
+CHUNK_SIZE = 16 # The canvas is stored in chunks of 16 x 16 cells
+CHUNK_CACHE_BUDGET = 64 * 1024 * 1024 # Memory (in bytes) that the pre-rendered chunk surfaces of all of the layers are allowed to use together (the chunks on the screen are always kept)
+ZOOM_TILE_SIZES = (128, 64, 32, 16, 8, 4, 2, 1) # The size of a tile at each zoom level, from the most zoomed in to the most zoomed out
+ZOOM_CACHE_BUDGET = 32 * 1024 * 1024 # Memory (in bytes) that the scaled graphics of the zoom levels are allowed to use
+MIN_SUPPORT_LINE_TILE_SIZE = 8 # The support lines are hidden when the tiles are smaller than this
+MINIMAP_SIZE = (240, 135) # Size of the minimap panel (in pixels)
+HORIZON_ROW = 6 # The row of cells that the horizon is at (the ocean is below it)
+CLOUD_PARALLAX = 0.3 # How far the clouds move compared to the level when panning
+CLOUD_HEIGHT = 400 # Height of the band of clouds above the horizon (in pixels)
+CLOUD_COUNT = 12 # Number of clouds on the cloud strip (the strip is twice as wide as the window)
+CLOUD_SEED = 1 # The clouds are placed at random, but with the same seed every time
+DIRTY_RECT_RENDERING = True # Only update the parts of the window that have changed, and wait for input when nothing is happening
+FLOOD_FILL_LIMIT = 100000 # The most cells that one flood fill can change
+LEVEL_PATH = "levels/level.mml" # Where CTRL + S saves the level (see level_file.py)
+LEVEL_STREAM_MARGIN = 2 # How many chunks around the screen are read from the level file
+AUTOSAVE_PATH = "levels/autosave.mml" # The autosave snapshot (the journal is saved next to it, see autosave.py)
+AUTOSAVE_INTERVAL = 5 # Seconds between autosaves
+AUTOSAVE_FRAME_BUDGET = 0.0005 # The most time (in seconds) that autosave can spend in one frame
+AUTOSAVE_JOURNAL_LIMIT = 4 * 1024 * 1024 # Once the journal is larger than this (in bytes), it is combined into a new snapshot
+HISTORY_MEMORY_BUDGET = 16 * 1024 * 1024 # Memory (in bytes) that the undo history is allowed to use (the oldest commands are removed first)
+SPATIAL_BUCKET_SIZE = 128 # Size (in pixels) of the buckets that sized objects are stored in for spatial queries (see spatial.py)
+PROFILER_FRAMES = 600 # How many frames the profiler keeps (F3 shows the profiler overlay)
+PROFILER_EXPORT_PATH = "profile" # F4 saves the profiled frames to profile.json and profile.csv
 
 # Editor graphics
 EDITOR_DATA = {
@@ -58,4 +84,10 @@ HORIZON_COLOUR = '#f5f1de'
 HORIZON_TOP_COLOUR = '#d1aa9d'
 LINE_COLOUR = 'black'
 BUTTON_BG_COLOUR = '#33323d'
-BUTTON_LINE_COLOUR = '#f5f1de'
\ No newline at end of file
+BUTTON_LINE_COLOUR = '#f5f1de'
+MINIMAP_BG_COLOUR = '#f5f1de'
+MINIMAP_TERRAIN_COLOUR = '#5c8a3a'
+MINIMAP_COIN_COLOUR = '#f1c232'
+MINIMAP_ENEMY_COLOUR = '#cc3333'
+MINIMAP_UNLOADED_COLOUR = '#a8a39a' # Chunks of the level file that haven't been read yet
+MINIMAP_VIEWPORT_COLOUR = 'black'
\ No newline at end of file
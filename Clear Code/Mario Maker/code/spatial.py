@@ -0,0 +1,193 @@
+import pygame
+from settings import *
+
+""" Spatial queries over the level (which cells or objects are inside of an area)
+- Positions and rects are in level pixels at TILE_SIZE (the same units that the play mode uses), not screen pixels
+- Tiles: the canvas is already a hash of cell positions, so TileIndex only turns an area into cells. Small areas look up each cell, large areas only look at the chunks that overlap them
+- Sized objects (e.g. enemies and palms): ObjectGrid puts each object into every bucket of a uniform grid that its rect overlaps, so a query only looks at the objects in the buckets that the query overlaps
+"""
+
+class TileIndex:
+    def __init__(self, canvas_data, tile_size = TILE_SIZE):
+        self.canvas_data = canvas_data
+        self.tile_size = tile_size
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # SUPPORT
+    def get_cell_rect(self, cell_pos):
+        return pygame.Rect(cell_pos[0] * self.tile_size, cell_pos[1] * self.tile_size, self.tile_size, self.tile_size)
+
+    def get_cells(self, rect):
+        # The cells at the top-left and bottom-right corners of a rect (floor division, so that negative cells are rounded down)
+        return (rect.left // self.tile_size, rect.top // self.tile_size), ((rect.right - 1) // self.tile_size, (rect.bottom - 1) // self.tile_size)
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Queries
+    def query_rect(self, rect):
+        # Every (cell pos, tile) that overlaps the rect
+        if rect.width <= 0 or rect.height <= 0:
+            return []
+        (left, top), (right, bottom) = self.get_cells(rect)
+
+        # Looking up each cell is faster for small areas (e.g. a collision check), looking through the chunks is faster for large areas
+        chunks, chunk_size = self.canvas_data.chunks, self.canvas_data.chunk_size
+        if (right - left + 1) * (bottom - top + 1) <= chunk_size * chunk_size:
+            found = []
+            for row in range(top, bottom + 1):
+                for column in range(left, right + 1):
+                    # The same as self.canvas_data.get((column, row)), without the extra function calls
+                    chunk = chunks.get((column // chunk_size, row // chunk_size))
+                    if chunk:
+                        tile = chunk.get((column, row))
+                        if tile:
+                            found.append(((column, row), tile))
+            return found
+        return [(cell_pos, tile) for cell_pos, tile in self.canvas_data.items_in_area((left, top), (right, bottom))
+                if left <= cell_pos[0] <= right and top <= cell_pos[1] <= bottom]
+
+    def query_point(self, pos):
+        # The (cell pos, tile) at a point, or None if the cell is empty
+        cell_pos = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        tile = self.canvas_data.get(cell_pos)
+        return (cell_pos, tile) if tile else None
+
+    def query_radius(self, centre, radius):
+        # Every (cell pos, tile) whose cell is touched by a circle
+        found = []
+        for cell_pos, tile in self.query_rect(pygame.Rect(centre[0] - radius, centre[1] - radius, radius * 2 + 1, radius * 2 + 1)):
+            # The distance from the centre to the closest point of the cell
+            cell_rect = self.get_cell_rect(cell_pos)
+            distance_x = centre[0] - max(cell_rect.left, min(centre[0], cell_rect.right))
+            distance_y = centre[1] - max(cell_rect.top, min(centre[1], cell_rect.bottom))
+            if distance_x * distance_x + distance_y * distance_y <= radius * radius:
+                found.append((cell_pos, tile))
+        return found
+
+    def collide_terrain(self, rect):
+        # The rects of the terrain cells that overlap a rect (used for collisions with the level, so it is called for every moving object on every frame)
+        tile_size = self.tile_size
+        return [pygame.Rect(cell_pos[0] * tile_size, cell_pos[1] * tile_size, tile_size, tile_size) for cell_pos, tile in self.query_rect(rect) if tile.has_terrain]
+
+class ObjectGrid:
+    def __init__(self, bucket_size = SPATIAL_BUCKET_SIZE):
+        self.bucket_size = bucket_size # In pixels, this should be about the size of the largest common object
+        self.buckets = {} # Bucket pos: set of keys
+        self.rects = {} # Key: rect of the object
+        self.bucket_areas = {} # Key: (left, top, right, bottom) buckets that the object is in
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # SUPPORT
+    def get_bucket_area(self, rect):
+        # The buckets at the top-left and bottom-right corners of a rect
+        return (rect.left // self.bucket_size, rect.top // self.bucket_size, (rect.right - 1) // self.bucket_size, (rect.bottom - 1) // self.bucket_size)
+
+    def add_to_buckets(self, key, bucket_area):
+        left, top, right, bottom = bucket_area
+        for bucket_row in range(top, bottom + 1):
+            for bucket_col in range(left, right + 1):
+                bucket = self.buckets.get((bucket_col, bucket_row))
+                if bucket is None:
+                    self.buckets[(bucket_col, bucket_row)] = {key}
+                else:
+                    bucket.add(key)
+
+    def remove_from_buckets(self, key, bucket_area):
+        left, top, right, bottom = bucket_area
+        for bucket_row in range(top, bottom + 1):
+            for bucket_col in range(left, right + 1):
+                bucket = self.buckets[(bucket_col, bucket_row)]
+                bucket.discard(key)
+                # Empty buckets are not stored (the same as empty chunks)
+                if not bucket:
+                    del self.buckets[(bucket_col, bucket_row)]
+
+    def get_keys_in_area(self, rect):
+        # The keys in every bucket that the rect overlaps (An object that is in more than one of these buckets is only returned once)
+        left, top, right, bottom = self.get_bucket_area(rect)
+        keys = set()
+        for bucket_row in range(top, bottom + 1):
+            for bucket_col in range(left, right + 1):
+                bucket = self.buckets.get((bucket_col, bucket_row))
+                if bucket:
+                    keys.update(bucket)
+        return keys
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Objects
+    def insert(self, key, rect):
+        # The key can be anything hashable, e.g. the sprite itself
+        rect = pygame.Rect(rect)
+        bucket_area = self.get_bucket_area(rect)
+        self.rects[key] = rect
+        self.bucket_areas[key] = bucket_area
+        self.add_to_buckets(key, bucket_area)
+
+    def move(self, key, rect):
+        # The buckets only change when the object crosses into a different bucket, so most moves only update the rect
+        rect = pygame.Rect(rect)
+        self.rects[key] = rect
+        bucket_area = self.get_bucket_area(rect)
+        old_bucket_area = self.bucket_areas[key]
+        if bucket_area != old_bucket_area:
+            self.remove_from_buckets(key, old_bucket_area)
+            self.add_to_buckets(key, bucket_area)
+            self.bucket_areas[key] = bucket_area
+
+    def remove(self, key):
+        self.remove_from_buckets(key, self.bucket_areas.pop(key))
+        del self.rects[key]
+
+    def __len__(self):
+        return len(self.rects)
+
+    # ------------------------------------------------------------------------------------------------------------------------
+    # Queries
+    def query_rect(self, rect):
+        # Every key whose rect overlaps the rect
+        rect = pygame.Rect(rect)
+        rects = self.rects
+        return [key for key in self.get_keys_in_area(rect) if rects[key].colliderect(rect)]
+
+    def query_point(self, pos):
+        # Every key whose rect contains the point (e.g. the object under the mouse)
+        bucket = self.buckets.get((int(pos[0] // self.bucket_size), int(pos[1] // self.bucket_size)))
+        if not bucket:
+            return []
+        rects = self.rects
+        return [key for key in bucket if rects[key].collidepoint(pos)]
+
+    def query_radius(self, centre, radius):
+        # Every key whose rect is touched by a circle
+        found = []
+        radius_squared = radius * radius
+        for key in self.query_rect(pygame.Rect(centre[0] - radius, centre[1] - radius, radius * 2 + 1, radius * 2 + 1)):
+            # The distance from the centre to the closest point of the rect
+            rect = self.rects[key]
+            distance_x = centre[0] - max(rect.left, min(centre[0], rect.right))
+            distance_y = centre[1] - max(rect.top, min(centre[1], rect.bottom))
+            if distance_x * distance_x + distance_y * distance_y <= radius_squared:
+                found.append(key)
+        return found
+
+    def collision_pairs(self):
+        """ Every pair of keys whose rects overlap (the broadphase of the collisions, e.g. enemy against enemy)
+        - Only the objects that share a bucket are compared
+        - Two objects can share more than one bucket, so a pair is only kept by the bucket that the top-left corner of their overlap is in (this means that no pair is found twice, without having to remember the pairs)
+        """
+        pairs = []
+        rects = self.rects
+        bucket_size = self.bucket_size
+        for bucket_pos, bucket in self.buckets.items():
+            if len(bucket) < 2:
+                continue
+            keys = list(bucket)
+            for index, key in enumerate(keys):
+                rect = rects[key]
+                for other_key in keys[index + 1:]:
+                    other_rect = rects[other_key]
+                    if rect.colliderect(other_rect):
+                        overlap_left = rect.left if rect.left > other_rect.left else other_rect.left
+                        overlap_top = rect.top if rect.top > other_rect.top else other_rect.top
+                        if (overlap_left // bucket_size, overlap_top // bucket_size) == bucket_pos:
+                            pairs.append((key, other_key))
+        return pairs
@@ -0,0 +1,144 @@
+import pygame, random, time, json, argparse
+from settings import *
+from benchmark import get_percentile
+from canvas import ChunkedCanvas
+from editor import CanvasTile
+from spatial import TileIndex, ObjectGrid
+
+""" Spatial query benchmark
+- Thousands of enemies move around a level with terrain. On each frame every enemy is moved in the object grid, the enemy against enemy collision pairs are found, and every enemy is checked against the terrain
+- A few rect, point and radius queries are timed as well (the kind of queries that picking objects with the mouse would use)
+- --check compares the results of the first frame with checking every enemy against every other enemy (this is slow for a large number of enemies)
+- Run from the Mario Maker folder: python code/spatial_benchmark.py [--enemies 10000] [--frames 100] [--check] [--json results.json]
+"""
+LEVEL_SIZE = (400, 60) # Columns and rows of the level
+ENEMY_SIZE = (48, 48)
+
+# ------------------------------------------------------------------------------------------------------------------------
+# SUPPORT
+def create_level(columns, rows, level_random):
+    # A floor along the bottom of the level, with platforms of terrain scattered above it
+    canvas_data = ChunkedCanvas()
+    for column in range(columns):
+        for row in range(rows - 3, rows):
+            canvas_data[(column, row)] = CanvasTile(2)
+    for platform in range(columns * rows // 40):
+        column, row, width = level_random.randrange(columns), level_random.randrange(rows - 3), level_random.randrange(2, 8)
+        for platform_column in range(column, min(columns, column + width)):
+            canvas_data[(platform_column, row)] = CanvasTile(2)
+    return canvas_data
+
+def create_enemies(count, level_rect, level_random):
+    # Key: [rect, velocity]
+    enemies = {}
+    for key in range(count):
+        rect = pygame.Rect(level_random.randrange(level_rect.width - ENEMY_SIZE[0]), level_random.randrange(level_rect.height - ENEMY_SIZE[1]), *ENEMY_SIZE)
+        enemies[key] = [rect, [level_random.choice((-1, 1)) * level_random.randrange(1, 6), level_random.choice((-1, 1)) * level_random.randrange(1, 6)]]
+    return enemies
+
+def move_enemies(enemies, level_rect):
+    # Move each enemy by its velocity, bouncing off the edges of the level
+    for rect, velocity in enemies.values():
+        rect.move_ip(velocity)
+        if rect.left < level_rect.left or rect.right > level_rect.right:
+            velocity[0] = -velocity[0]
+            rect.clamp_ip(level_rect)
+        if rect.top < level_rect.top or rect.bottom > level_rect.bottom:
+            velocity[1] = -velocity[1]
+            rect.clamp_ip(level_rect)
+
+def check_results(enemies, grid, tile_index, canvas_data, query_rects):
+    # Compare the spatial queries with checking everything (Raises an AssertionError if they don't match)
+    rects = {key: enemy[0] for key, enemy in enemies.items()}
+    keys = list(rects)
+    expected_pairs = {frozenset((key, other_key)) for index, key in enumerate(keys) for other_key in keys[index + 1:] if rects[key].colliderect(rects[other_key])}
+    pairs = grid.collision_pairs()
+    assert len(pairs) == len(expected_pairs) and {frozenset(pair) for pair in pairs} == expected_pairs, "collision pairs don't match"
+
+    for rect in query_rects:
+        assert set(grid.query_rect(rect)) == {key for key, enemy_rect in rects.items() if enemy_rect.colliderect(rect)}, "object rect query doesn't match"
+        expected_cells = {cell_pos for cell_pos in canvas_data if tile_index.get_cell_rect(cell_pos).colliderect(rect)}
+        assert {cell_pos for cell_pos, tile in tile_index.query_rect(rect)} == expected_cells, "tile rect query doesn't match"
+        assert set(grid.query_point(rect.center)) == {key for key, enemy_rect in rects.items() if enemy_rect.collidepoint(rect.center)}, "object point query doesn't match"
+        assert len(grid.query_radius(rect.center, TILE_SIZE * 2)) <= len(grid.query_rect(rect.inflate(TILE_SIZE * 4 + 1, TILE_SIZE * 4 + 1))), "object radius query found too many objects"
+        assert {cell_pos for cell_pos, tile in tile_index.query_radius(rect.center, TILE_SIZE * 2)} <= {cell_pos for cell_pos, tile in tile_index.query_rect(pygame.Rect(rect.centerx - TILE_SIZE * 2, rect.centery - TILE_SIZE * 2, TILE_SIZE * 4 + 1, TILE_SIZE * 4 + 1))}, "tile radius query found cells outside of the circle"
+    print(f"check passed ({len(pairs)} collision pairs, {len(query_rects)} queries)")
+
+# ------------------------------------------------------------------------------------------------------------------------
+# Running
+def run_benchmark(enemy_count, frame_count, check = False, seed = 1):
+    level_random = random.Random(seed)
+    canvas_data = create_level(*LEVEL_SIZE, level_random)
+    tile_index = TileIndex(canvas_data)
+    level_rect = pygame.Rect(0, 0, LEVEL_SIZE[0] * TILE_SIZE, LEVEL_SIZE[1] * TILE_SIZE)
+
+    enemies = create_enemies(enemy_count, level_rect, level_random)
+    grid = ObjectGrid()
+    start = time.perf_counter()
+    for key, (rect, velocity) in enemies.items():
+        grid.insert(key, rect)
+    insert_time = time.perf_counter() - start
+
+    # The queries are the size of the window, a few tiles and a single point
+    query_rects = [pygame.Rect(level_random.randrange(level_rect.width - size[0]), level_random.randrange(level_rect.height - size[1]), *size)
+                   for size in ((WINDOW_WIDTH, WINDOW_HEIGHT), (TILE_SIZE * 3, TILE_SIZE * 3), (1, 1)) for repeat in range(5)]
+    if check:
+        check_results(enemies, grid, tile_index, canvas_data, query_rects)
+
+    phase_times = {"move": [], "collision_pairs": [], "terrain": [], "queries": []}
+    pair_count = terrain_hits = 0
+    for frame in range(frame_count):
+        start = time.perf_counter()
+        move_enemies(enemies, level_rect)
+        for key, (rect, velocity) in enemies.items():
+            grid.move(key, rect)
+        phase_times["move"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        pair_count += len(grid.collision_pairs())
+        phase_times["collision_pairs"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for rect, velocity in enemies.values():
+            terrain_hits += len(tile_index.collide_terrain(rect))
+        phase_times["terrain"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for rect in query_rects:
+            grid.query_rect(rect)
+            grid.query_point(rect.center)
+            grid.query_radius(rect.center, TILE_SIZE * 2)
+            tile_index.query_rect(rect)
+            tile_index.query_radius(rect.center, TILE_SIZE * 2)
+        phase_times["queries"].append(time.perf_counter() - start)
+
+    frame_times = sorted(sum(times) for times in zip(*phase_times.values()))
+    return {
+        "enemies": enemy_count,
+        "frames": frame_count,
+        "insert_ms": insert_time * 1000,
+        "mean_ms": sum(frame_times) / len(frame_times) * 1000,
+        "p50_ms": get_percentile(frame_times, 50) * 1000,
+        "p99_ms": get_percentile(frame_times, 99) * 1000,
+        "phases_ms_per_frame": {phase: sum(times) / len(times) * 1000 for phase, times in phase_times.items()},
+        "collision_pairs_per_frame": pair_count / frame_count,
+        "terrain_hits_per_frame": terrain_hits / frame_count,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the spatial queries with many moving enemies")
+    parser.add_argument("--enemies", type = int, default = 10000, help = "The number of moving enemies")
+    parser.add_argument("--frames", type = int, default = 100, help = "The number of frames to run")
+    parser.add_argument("--check", action = "store_true", help = "Check the results of the first frame against checking everything")
+    parser.add_argument("--json", help = "Save the results to this file, so that they can be compared over time")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.enemies, args.frames, args.check)
+    print(f"{result['enemies']} enemies, {result['frames']} frames: insert {result['insert_ms']:.1f} ms, mean {result['mean_ms']:.2f} ms, p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, "
+          f"{result['collision_pairs_per_frame']:.0f} collision pairs and {result['terrain_hits_per_frame']:.0f} terrain hits per frame")
+    for phase, ms in result["phases_ms_per_frame"].items():
+        print(f"    {phase}: {ms:.3f} ms/frame")
+
+    if args.json:
+        with open(args.json, "w") as results_file:
+            json.dump(result, results_file, indent = 4)
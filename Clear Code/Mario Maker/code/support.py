@@ -1,31 +1,96 @@
-import pygame
-from os import walk # Access to the file system
+import pygame, pickle
+from os import walk, makedirs, stat # Access to the file system
+from os.path import join
+from concurrent.futures import ThreadPoolExecutor # Used to decode the images at the same time
+from settings import *
+
+""" Image importing:
+- The images inside of a folder are decoded in parallel on a thread pool, then converted to the pixel format of the display (which makes blitting them much faster)
+- The raw pixels of each folder are saved in a cache file, along with the modification time and size of each image. When the images haven't changed, the next start-up skips decoding the PNGs completely
+"""
+
+def get_image_names(path):
+    # The names of the image files inside of the folder (sorted, so that animation frames are always in the same order)
+    for folder_name, sub_folders, image_files in walk(path):
+        return sorted(image_files)
+    return []
+
+def get_cache_path(path):
+    # Each folder has its own cache file e.g. graphics/terrain/land ---> cache/assets/graphics_terrain_land.cache
+    return join(ASSET_CACHE_PATH, path.replace("/", "_") + ".cache")
+
+def load_cache(path):
+    try:
+        with open(get_cache_path(path), "rb") as cache_file:
+            return pickle.load(cache_file)
+    # If there isn't a cache yet (or it can't be read), all of the images will be decoded
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        return {}
+
+def save_cache(path, cache):
+    try:
+        makedirs(ASSET_CACHE_PATH, exist_ok = True)
+        with open(get_cache_path(path), "wb") as cache_file:
+            pickle.dump(cache, cache_file, protocol = pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass # The cache is only used to speed up the next start-up, so the game still works without it
+
+def decode_image(full_path):
+    # Decode the PNG and return its raw pixels (This runs on the thread pool)
+    image_surface = pygame.image.load(full_path)
+    return image_surface.get_size(), pygame.image.tostring(image_surface, "RGBA")
+
+def import_images(path):
+    # Returns a list of (image name, surface) for every image inside of the folder
+    image_names = get_image_names(path)
+    cache = load_cache(path)
+
+    # Find the images that aren't in the cache or have changed since they were cached (The modification time or size of the file is different)
+    file_stats = {}
+    changed_names = []
+    for image_name in image_names:
+        file_stat = stat(path + "/" + image_name)
+        file_stats[image_name] = (file_stat.st_mtime_ns, file_stat.st_size)
+        if image_name not in cache or cache[image_name][0] != file_stats[image_name]:
+            changed_names.append(image_name)
+
+    # Decode the changed images in parallel
+    if changed_names:
+        with ThreadPoolExecutor() as executor:
+            decoded_images = executor.map(decode_image, [path + "/" + image_name for image_name in changed_names])
+            for image_name, (size, pixels) in zip(changed_names, decoded_images):
+                cache[image_name] = (file_stats[image_name], size, pixels)
+
+    # Remove images that have been deleted from the folder, then save the cache if anything has changed
+    removed_names = [image_name for image_name in cache if image_name not in file_stats]
+    for image_name in removed_names:
+        del cache[image_name]
+    if changed_names or removed_names:
+        save_cache(path, cache)
+
+    images = []
+    for image_name in image_names:
+        file_stat, size, pixels = cache[image_name]
+        image_surface = pygame.image.frombuffer(pixels, size, "RGBA")
+        # Convert the surface to the pixel format of the display (This can only be done once the display has been created)
+        image_surface = image_surface.convert_alpha() if pygame.display.get_surface() else image_surface.copy()
+        images.append((image_name, image_surface))
+
+    return images
 
 
 def import_folder(path):
     # Any picture inside of path will be imported and placed in surface_list
-    surface_list = []
-    # Extract only the image files
-    for folder_name, sub_folders, image_files in walk(path):
-        for image_name in image_files:
-            # Find the full path of the image
-            full_path = path + "/" + image_name
-            # Use the full path to load an image
-            image_surface = pygame.image.load(full_path)
-            # Add image surface to the surface list
-            surface_list.append(image_surface)
+    surface_list = [image_surface for image_name, image_surface in import_images(path)]
 
     return surface_list
-        
+
 # Used for the land tiles
 def import_folder_dict(path):
     surface_dict = {}
 
-    for folder_name, sub_folders, image_files in walk(path):
-        for image_name in image_files:
-            full_path = path + "/" + image_name
-            image_surface = pygame.image.load(full_path)
-            # Create a new key: value pair
-            surface_dict[image_name.split(".")[0]] = image_surface # Get rid of the .png with .split
-            
+    for image_name, image_surface in import_images(path):
+        # Create a new key: value pair
+        surface_dict[image_name.split(".")[0]] = image_surface # Get rid of the .png with .split
+
     return surface_dict
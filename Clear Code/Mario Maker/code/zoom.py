@@ -0,0 +1,90 @@
+import pygame
+from collections import OrderedDict
+from settings import *
+from autotile import create_terrain_table
+
+def scale_surface(surface, scale):
+    # Pixel art is scaled up without smoothing (so it stays sharp), and smoothed when it is scaled down (so small tiles keep the colours of the whole tile)
+    size = (max(1, round(surface.get_width() * scale)), max(1, round(surface.get_height() * scale)))
+    if scale >= 1:
+        return pygame.transform.scale(surface, size)
+    return pygame.transform.smoothscale(surface, size)
+
+class TileSet:
+    # The graphics of the canvas at one tile size
+    def __init__(self, tile_size, land_tiles, assets):
+        self.tile_size = tile_size
+        self.scale = tile_size / TILE_SIZE
+        self.assets = assets
+
+        # Terrain (each land tile is only scaled once, even though it is used by many masks)
+        if tile_size == TILE_SIZE:
+            scaled_land_tiles = land_tiles
+        else:
+            scaled_land_tiles = {name: scale_surface(surface, self.scale) for name, surface in land_tiles.items()}
+        self.terrain_table = create_terrain_table(scaled_land_tiles)
+        self.memory_used = sum(self.get_surface_size(surface) for surface in scaled_land_tiles.values()) if tile_size != TILE_SIZE else 0
+
+        # The graphics of the water, coins and enemies are all created here, so drawing the level never needs to create a surface
+        self.frame_tables = {} # Tile id: list of (frame, position of the frame inside of the cell)
+        self.frame_bounds = {} # Tile id: area covered by every frame, relative to the top-left of the cell
+        for tile_id, data in EDITOR_DATA.items():
+            if data["style"] in ("water", "coin", "enemy"):
+                self.add_frame_table(tile_id, data["style"])
+
+        # Water that has more water on top of it doesn't move (only the surface of the water is animated)
+        self.water_bottom = self.scale_image(assets.get_image("graphics/terrain/water/water_bottom.png"))
+
+    def get_surface_size(self, surface):
+        # Bytes used by the pixels of the surface
+        return surface.get_pitch() * surface.get_height()
+
+    def scale_image(self, surface):
+        # Scale a graphic to the tile size of this tile set
+        if self.tile_size == TILE_SIZE:
+            return surface
+        surface = scale_surface(surface, self.scale)
+        self.memory_used += self.get_surface_size(surface)
+        return surface
+
+    def add_frame_table(self, tile_id, style):
+        # Where each frame is drawn is worked out once, so drawing a frame is just one blit
+        frame_table = []
+        for frame in self.assets.get_frames(tile_id):
+            frame = self.scale_image(frame)
+            match style:
+                case "coin": offset = ((self.tile_size - frame.get_width()) // 2, (self.tile_size - frame.get_height()) // 2) # Middle of the cell
+                case "enemy": offset = ((self.tile_size - frame.get_width()) // 2, self.tile_size - frame.get_height()) # Standing on the bottom of the cell
+                case _: offset = (0, 0) # Top-left of the cell
+            frame_table.append((frame, offset))
+        self.frame_tables[tile_id] = frame_table
+        self.frame_bounds[tile_id] = pygame.Rect(frame_table[0][1], frame_table[0][0].get_size()).unionall([pygame.Rect(offset, frame.get_size()) for frame, offset in frame_table])
+
+class ScaledTileCache:
+    """ Keeps the graphics of the canvas scaled to each zoom level, so that nothing is scaled while drawing
+    - A tile set is created the first time its zoom level is used
+    - The tile sets are kept in least recently used order. Once the memory budget is exceeded, the tile sets that haven't been used for the longest time are removed (they will be scaled again if they are needed)
+    """
+    def __init__(self, land_tiles, assets, memory_budget = ZOOM_CACHE_BUDGET):
+        self.land_tiles = land_tiles
+        self.assets = assets
+        self.memory_budget = memory_budget # In bytes
+
+        self.tile_sets = OrderedDict() # Tile size: tile set (The least recently used tile set is at the start)
+
+    def evict(self, keep):
+        # Remove the least recently used tile sets until we are within the memory budget (never removing the tile set that was just requested)
+        for tile_size in list(self.tile_sets):
+            if sum(tile_set.memory_used for tile_set in self.tile_sets.values()) <= self.memory_budget:
+                break
+            if tile_size != keep:
+                del self.tile_sets[tile_size]
+
+    def get_tile_set(self, tile_size):
+        if tile_size in self.tile_sets:
+            # Move the tile set to the end, as it is now the most recently used tile set
+            self.tile_sets.move_to_end(tile_size)
+        else:
+            self.tile_sets[tile_size] = TileSet(tile_size, self.land_tiles, self.assets)
+            self.evict(keep = tile_size)
+        return self.tile_sets[tile_size]
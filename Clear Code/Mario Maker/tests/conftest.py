@@ -0,0 +1,5 @@
+import os, sys
+
+# The tests run the editor without a window (see headless.py), which also makes the graphics paths work from any folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code"))
+import headless
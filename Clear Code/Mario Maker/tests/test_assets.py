@@ -0,0 +1,13 @@
+from settings import EDITOR_DATA, ZOOM_TILE_SIZES
+from main import Main
+
+def test_tile_sets_share_the_loaded_animation_sets():
+    main = Main()
+    assets = main.assets
+    folders = sorted({data["graphics"] for data in EDITOR_DATA.values() if data["graphics"]})
+    frames = {folder: assets.get_animation(folder) for folder in folders}
+
+    # A tile set for another zoom level scales the same frames, rather than loading a second copy of any set
+    main.editor.tile_cache.get_tile_set(ZOOM_TILE_SIZES[-1])
+    assert all(assets.get_animation(folder) is frames[folder] for folder in folders)
+    assert set(assets.animations) == set(folders)
@@ -0,0 +1,23 @@
+import pygame
+from settings import EDITOR_DATA
+from support import import_folder
+from main import Main
+from atlas import ANIMATED_STYLES
+
+def test_canvas_animations_and_menu_images_come_from_the_atlases():
+    main = Main()
+    assets = main.assets
+    for tile_id, data in EDITOR_DATA.items():
+        if data["style"] in ANIMATED_STYLES:
+            # The same frames as loading the folder, but sharing the pixels of an atlas page
+            frames = assets.get_frames(tile_id)
+            loaded_frames = import_folder(data["graphics"])
+            assert all(frame.get_parent() is not None for frame in frames)
+            assert [pygame.image.tostring(frame, "RGBA") for frame in frames] == [pygame.image.tostring(frame, "RGBA") for frame in loaded_frames]
+        if data["menu_surf"]:
+            assert assets.get_menu_surf(tile_id).get_parent() is not None
+            assert assets.get_preview(tile_id).get_parent() is not None
+
+    # The animations that the tile set uses are never loaded from their own files
+    assert all(frame.get_parent() is not None for frames in assets.animations.values() for frame in frames)
+    assert main.editor.tile_set.water_bottom.get_parent() is not None
@@ -0,0 +1,31 @@
+import os
+from main import Main
+from autosave import Autosave, read_autosave
+
+def start_autosave(path):
+    editor = Main().editor
+    editor.autosave = Autosave(editor.canvas_data, path, interval = 0)
+    editor.set_cells([(4, 4), (5, 4)], 2)
+    while editor.canvas_data.changed_cells or editor.autosave.pending_cells:
+        editor.autosave.update()
+    return editor.autosave
+
+def test_clean_stop_leaves_nothing_to_recover(tmp_path):
+    path = str(tmp_path / "autosave.mml")
+    start_autosave(path).stop()
+    assert not os.path.exists(path) and not os.path.exists(path + ".journal")
+
+    # The next session doesn't treat the last one as a crash
+    Autosave(Main().editor.canvas_data, path).stop()
+    assert not os.path.exists(path + ".recovered")
+
+def test_crash_is_recovered(tmp_path):
+    path = str(tmp_path / "autosave.mml")
+    autosave = start_autosave(path)
+
+    # Stop the worker without the clean up of stop(), as if the editor had crashed
+    autosave.batches.put(("stop", None))
+    autosave.worker.join()
+
+    Autosave(Main().editor.canvas_data, path).stop()
+    assert set(read_autosave(path + ".recovered")) == {(4, 4), (5, 4)}
@@ -0,0 +1,20 @@
+import pygame
+from main import Main
+from editor import WATER_ID
+from benchmark import fill_level
+
+def test_layers_share_one_memory_budget():
+    editor = Main().editor
+    # Terrain on the main layer with two rows of water below it (the lower row is drawn into the chunks of the water layer)
+    fill_level(editor, 400, 4)
+    editor.set_cells([(column, row) for column in range(400) for row in (4, 5)], WATER_ID)
+    chunk_bytes = (editor.canvas_data.chunk_size * editor.tile_size) ** 2 * 4
+    editor.layers.memory_budget = chunk_bytes * 6
+
+    # Pan along the level, both layers render a surface for each chunk
+    for column in range(0, 400, 8):
+        editor.origin = pygame.math.Vector2(-column * editor.tile_size, 0)
+        editor.redraw_all = True
+        editor.run(0.016, [])
+        assert editor.layers.get_memory_used() <= editor.layers.memory_budget
+    assert editor.layers.chunk_caches["water"].memory_used > 0 and editor.layers.chunk_caches["main"].memory_used > 0
@@ -0,0 +1,39 @@
+import pygame
+from main import Main
+from replay import get_canvas_checksum
+
+FAR_CHUNK_CELLS = [(column, row) for column in range(500, 505) for row in range(2, 7)] # A 5 x 5 block of cells that is off the screen when the editor starts
+
+def stream_level(editor, cells):
+    # Pan over the cells so that every chunk around them is read from the level file
+    for cell_pos in cells:
+        editor.origin = pygame.math.Vector2(-cell_pos[0] * editor.tile_size, -cell_pos[1] * editor.tile_size)
+        editor.stream_chunks()
+
+def test_save_then_edit_chunk_that_was_never_streamed(tmp_path):
+    path = str(tmp_path / "level.mml")
+    editor = Main(level_path = path).editor
+    editor.set_cells([(1, 1)], 2)
+    editor.set_cells(FAR_CHUNK_CELLS, 2)
+    editor.save_level()
+    editor.level_file.close()
+
+    # Open the level again, the far chunk is only in the file
+    editor = Main(level_path = path).editor
+    assert (501, 2) not in editor.canvas_data
+
+    # Saving before panning to the far chunk must not stop it from being streamed in later
+    editor.save_level()
+    stream_level(editor, [(501, 2)])
+    assert all(cell_pos in editor.canvas_data for cell_pos in FAR_CHUNK_CELLS)
+
+    # Painting one cell there and saving again keeps the rest of the chunk
+    editor.set_cells([(501, 1)], 2)
+    editor.save_level()
+    expected = get_canvas_checksum(editor.canvas_data)
+    editor.level_file.close()
+
+    editor = Main(level_path = path).editor
+    stream_level(editor, [(1, 1), (501, 2)])
+    assert len(editor.canvas_data) == len(FAR_CHUNK_CELLS) + 2
+    assert get_canvas_checksum(editor.canvas_data) == expected
@@ -0,0 +1,54 @@
+import os, pygame
+from headless import ScriptedInput
+from settings import LEVEL_PATH
+from main import Main
+from replay import InputRecorder, load_recording, open_recorded_level, replay
+
+def key_event(event_type, key):
+    return pygame.event.Event(event_type, key = key, mod = 0, unicode = "", scancode = 0)
+
+def test_recorded_modifier_is_held_in_replay(tmp_path):
+    # Record Ctrl+Z (undo), the editor checks that Ctrl is held with keys[pygame.K_LCTRL]
+    path = str(tmp_path / "session.jsonl")
+    recorder = InputRecorder(path)
+    recorder.record(0.016, [key_event(pygame.KEYDOWN, pygame.K_LCTRL)])
+    recorder.record(0.016, [key_event(pygame.KEYDOWN, pygame.K_z), key_event(pygame.KEYUP, pygame.K_z)])
+    recorder.record(0.016, [key_event(pygame.KEYUP, pygame.K_LCTRL)])
+    recorder.file.close()
+
+    header, frames = load_recording(path)
+    assert [frame["held_keys"] for frame in frames] == [[pygame.K_LCTRL], [pygame.K_LCTRL], []]
+
+    # Replaying it undoes the tile that was added before
+    main = Main()
+    script = ScriptedInput()
+    main.editor.set_cells([(3, 3)], 2)
+    assert (3, 3) in main.editor.canvas_data
+    replay(main, script, frames)
+    assert (3, 3) not in main.editor.canvas_data
+
+def test_replayed_save_uses_a_copy_of_the_recorded_level(tmp_path):
+    # A level with one tile, which is open while Ctrl+S is recorded
+    level_path = str(tmp_path / "level.mml")
+    editor = Main(level_path = level_path).editor
+    editor.set_cells([(2, 2)], 2)
+    editor.save_level()
+    editor.level_file.close()
+
+    path = str(tmp_path / "session.jsonl")
+    recorder = InputRecorder(path, level_path)
+    recorder.record(0.016, [key_event(pygame.KEYDOWN, pygame.K_LCTRL)])
+    recorder.record(0.016, [key_event(pygame.KEYDOWN, pygame.K_s), key_event(pygame.KEYUP, pygame.K_s)])
+    recorder.record(0.016, [key_event(pygame.KEYUP, pygame.K_LCTRL)])
+    recorder.file.close()
+
+    level_before = open(LEVEL_PATH, "rb").read() if os.path.exists(LEVEL_PATH) else None
+    header, frames = load_recording(path)
+    main = Main(level_path = open_recorded_level(path, header))
+    script = ScriptedInput()
+    replay(main, script, frames)
+
+    # The replay started from the recorded level, and saved to its own copy of it
+    assert (2, 2) in main.editor.canvas_data
+    assert os.path.exists(main.editor.level_path) and main.editor.level_path not in (LEVEL_PATH, level_path)
+    assert (open(LEVEL_PATH, "rb").read() if os.path.exists(LEVEL_PATH) else None) == level_before
@@ -0,0 +1,25 @@
+from main import Main
+from editor import WATER_ID
+
+def get_water_on_top(editor, cells):
+    return [editor.canvas_data[cell_pos].water_on_top for cell_pos in cells]
+
+def test_water_under_water_uses_the_bottom_graphic():
+    editor = Main().editor
+    column = [(4, 2), (4, 3), (4, 4)]
+    editor.set_cells(column, WATER_ID)
+    editor.history.end_command(editor.canvas_data)
+    assert get_water_on_top(editor, column) == [False, True, True]
+
+    # The chunk of the water layer now has the water bottom graphic rendered into it
+    editor.run(0.016, [])
+    assert editor.layers.chunk_caches["water"].surfaces[editor.canvas_data.get_chunk_pos((4, 3))] is not None
+
+    # Removing the top cell makes the cell below it the surface of the water
+    editor.set_cells([(4, 2)], None)
+    assert get_water_on_top(editor, column[1:]) == [False, True]
+
+    # Undo puts it back
+    editor.history.end_command(editor.canvas_data)
+    editor.apply_cell_states(editor.history.undo())
+    assert get_water_on_top(editor, column) == [False, True, True]